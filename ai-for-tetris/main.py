@@ -1,11 +1,19 @@
+import argparse
+
 import pygame
 from src.Application import Application
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python main.py")
+    parser.add_argument("--replay", default=None,
+                        help="Records the game and saves its replay to this "
+                             "file on exit, see python -m src.replay")
+    args = parser.parse_args()
+
     pygame.init()
     pygame.font.init()
 
-    app = Application()
+    app = Application(replay_path=args.replay)
     app.run()
 
     pygame.quit()
@@ -1,6 +1,38 @@
 import numpy as np
 import pprint
 import copy
+import os
+
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+
+# Ways of computing the fitnesses of a population, see
+# GeneticAlgorithmParameters
+EVALUATORS = ("serial", "thread", "process")
+
+# Fitness function of a worker process of the process evaluator
+_worker_fitness = None
+
+def _init_worker(fitness):
+    """
+        Initializes a worker process of the process evaluator
+
+        The fitness function is sent once to each worker instead of once per
+        genome.
+
+        Parameters
+        ----------
+            fitness: function
+                The fitness function, see GeneticAlgorithmParameters
+    """
+    global _worker_fitness
+    _worker_fitness = fitness
+
+def _compute_fitness(id, genome, seed):
+    """
+        Computes a fitness in a worker process, see _init_worker
+    """
+    return _worker_fitness(id, genome, seed)
 
 class GeneticAlgorithmParameters:
     """
@@ -34,8 +66,52 @@ class GeneticAlgorithmParameters:
                     -mutation_rate: float
                         The mutation rate
                     -fitness: function
-                        Takes as parameter a genome and return a float value 
-                        that needs to be maximized
+                        Takes as parameters the id of a genome, the genome
+                        and a seed for its evaluation (derived from the id)
+                        and return a float value that needs to be maximized
+                    -tasks: int
+                        The number of times the fitness of a genome is
+                        computed in a round, each time with its own seed
+                        (for instance one task per game), the fitness of
+                        the genome being their mean. Tasks are evaluated
+                        independently, hence a pool can run the tasks of a
+                        same genome at once
+                    -evaluator: str
+                        How the fitness tasks of a population are computed,
+                        among EVALUATORS : one after the other, by a pool
+                        of threads or by a pool of processes. Threads only
+                        help fitness functions that release the GIL (most
+                        of the time spent in numpy or waiting), a pure
+                        Python fitness such as LookupAI is slower with
+                        threads than serial. Processes get their own copy
+                        of the fitness, and of its caches : with LookupAI,
+                        each worker starts with an empty transposition
+                        table that the other workers do not share, and
+                        processes only pay off with several CPUs (on a
+                        single one, trainings were 2 to 3 times slower than
+                        serial)
+                    -workers: int
+                        The number of threads or processes of the pool,
+                        default is the number of CPUs
+                    -population_fitness: function or None
+                        When given, used instead of fitness and the
+                        evaluator : takes as parameters the ids of the
+                        genomes, the population and a seed shared by the
+                        whole population, and returns the fitness of each
+                        genome at once
+                    -rounds: int
+                        The number of rounds of the evaluation of a
+                        generation, see GeneticAlgorithm._compute_fitnesses.
+                        The fitness is called once per round (and task),
+                        each time with a new seed
+                    -survival_rate: float
+                        The fraction of the genomes evaluated in a round
+                        that are evaluated again in the next one
+                    -seed_refresh: int
+                        The number of generations sharing the same seeds :
+                        all the genomes of these generations are evaluated
+                        on the same games (see GeneticAlgorithm._compute_seed).
+                        0 gives each genome its own seeds
         """
         self.seed = kwargs.get("seed", None)
         self.random = np.random.RandomState(self.seed)
@@ -48,7 +124,29 @@ class GeneticAlgorithmParameters:
         self.reproduction_elitist = kwargs.get("reproduction_elitist", 5)
 
         self.mutation_rate = kwargs.get("mutation_rate", 0.2)
-        self.fitness = kwargs.get("fitness", lambda x, y: 0.0)
+        self.fitness = kwargs.get("fitness", lambda x, y, z: 0.0)
+        self.tasks = kwargs.get("tasks", 1)
+
+        self.evaluator = kwargs.get("evaluator", "serial")
+        self.workers = kwargs.get("workers", os.cpu_count())
+        self.population_fitness = kwargs.get("population_fitness", None)
+
+        self.rounds = kwargs.get("rounds", 1)
+        self.survival_rate = kwargs.get("survival_rate", 0.5)
+
+        self.seed_refresh = kwargs.get("seed_refresh", 1)
+
+        if self.tasks < 1:
+            raise ValueError("At least one task is required")
+
+        if self.rounds < 1:
+            raise ValueError("At least one round is required")
+
+        if self.seed_refresh < 0:
+            raise ValueError("The seed refresh must not be negative")
+
+        if self.evaluator not in EVALUATORS:
+            raise NameError("Undefined evaluator " + str(self.evaluator))
 
 class GeneticAlgorithmStatistics:
     """
@@ -82,7 +180,7 @@ class GeneticAlgorithmStatistics:
             "max_genome": []
         }
 
-    def aggregate(self, population, fitnesses):
+    def aggregate(self, population, fitnesses, ranking=None):
         """
             Aggregate statistcs
 
@@ -93,14 +191,23 @@ class GeneticAlgorithmStatistics:
                 fitnesses: 1d array_like
                     The fitnesses for each member of the
                     popumation
+                ranking: 1d array_like of int or None
+                    The indices of the members from the best to the worst,
+                    when it is not the order of the fitnesses. The min and
+                    max are then the ones of the worst and best members
         """
+        fitnesses = np.asarray(fitnesses)
+
+        if ranking is None:
+            ranking = np.argsort(fitnesses)[::-1]
+
         self.data.append({
             "sd": np.std(fitnesses),
             "mean": np.mean(fitnesses), 
-            "min": np.min(fitnesses), 
-            "max": np.max(fitnesses), 
-            "min_genome": population[np.argmin(fitnesses)], 
-            "max_genome": population[np.argmax(fitnesses)]
+            "min": fitnesses[ranking[-1]], 
+            "max": fitnesses[ranking[0]], 
+            "min_genome": population[ranking[-1]], 
+            "max_genome": population[ranking[0]]
         })
 
         self.allTime["count"] += 1
@@ -134,6 +241,207 @@ class GeneticAlgorithm:
             size = (self._params.population_size, self._params.genes_count)
         )
 
+        # Root of the seeds given to the fitness function, see _compute_seed
+        self._entropy = np.random.SeedSequence(self._params.seed).entropy
+        # Pool of the thread and process evaluators during the training
+        self._executor = None
+
+    def _compute_seed(self, id, round_index=0, task=0):
+        """
+            Derives the seed of a fitness task of a genome
+
+            Seeds are drawn from a bank of seed sets : with seed_refresh
+            set, every genome of the generations k * seed_refresh to
+            (k + 1) * seed_refresh - 1 gets the seed of set k. Genomes
+            compared by the selection then play the same games, hence their
+            fitness differences come from the genomes rather than from the
+            pieces they were dealt, and refreshing the set keeps the
+            population from specializing on a few games.
+
+            Parameters
+            ----------
+                id: int
+                    The id of the genome
+                round_index: int
+                    The round of the evaluation
+                task: int
+                    The index of the task, see GeneticAlgorithmParameters
+
+            Returns
+            -------
+                int
+                    A seed that only depends on the id (or on its seed set),
+                    the round, the task and the seed of the parameters
+        """
+        key = id
+
+        if self._params.seed_refresh != 0:
+            generation = id // self._params.population_size
+            key = generation // self._params.seed_refresh
+
+        sequence = np.random.SeedSequence(
+            self._entropy, spawn_key=(key, round_index, task)
+        )
+        return int(sequence.generate_state(1)[0])
+
+    def _create_executor(self):
+        """
+            Creates the pool of the evaluator, see GeneticAlgorithmParameters
+
+            Returns
+            -------
+                concurrent.futures.Executor or None
+                    The pool, None for the serial evaluator and with a
+                    population fitness
+        """
+        if self._params.population_fitness is not None:
+            return None
+
+        if self._params.evaluator == "thread":
+            return ThreadPoolExecutor(self._params.workers)
+        elif self._params.evaluator == "process":
+            return ProcessPoolExecutor(
+                self._params.workers, initializer=_init_worker,
+                initargs=(self._params.fitness, )
+            )
+
+        return None
+
+    def _compute_fitnesses(self, generation):
+        """
+            Computes the fitness of each genome of the population
+
+            Genome j of the generation has the id
+            generation * population_size + j and is evaluated with the seed
+            derived from its id (see _compute_seed), hence the fitnesses do
+            not depend on the evaluator nor on the order of the evaluations.
+
+            The evaluation is a race of several rounds : every genome is
+            evaluated in the first round, then only the best survival_rate
+            of them (and at least elitism genomes) in the next one, and so
+            on, ranking the genomes by their mean fitness over the rounds
+            they played. The fitness of a genome is this mean, hence the
+            worst genomes are dropped after a few games while the best ones
+            are compared on all the rounds.
+
+            A genome dropped early may have a greater mean than a survivor
+            (a lucky first round), hence genomes are ranked by number of
+            rounds played first and by fitness then, see _rank.
+
+            Parameters
+            ----------
+                generation: int
+                    The index of the generation
+
+            Returns
+            -------
+                1d numpy array of float, 1d numpy array of int
+                    The fitness of each genome and the number of rounds it
+                    played
+        """
+        size = self._params.population_size
+        ids = np.array([generation * size + j for j in range(0, size)])
+
+        # Genomes still evaluated, sum of their fitnesses and rounds played
+        alive = np.arange(size)
+        totals = np.zeros(size)
+        played = np.zeros(size)
+
+        for round_index in range(0, self._params.rounds):
+            if round_index != 0:
+                survivors = max(
+                    int(np.ceil(self._params.survival_rate * len(alive))),
+                    min(self._params.elitism, len(alive))
+                )
+                ranking = np.argsort(
+                    -totals[alive] / played[alive], kind="stable"
+                )
+                alive = np.sort(alive[ranking[:survivors]])
+
+            totals[alive] += self._evaluate(ids[alive], alive, round_index)
+            played[alive] += 1
+
+        return totals / played, played.astype(int)
+
+    def _rank(self, fitnesses, played):
+        """
+            Ranks the genomes of a generation, see _compute_fitnesses
+
+            Parameters
+            ----------
+                fitnesses: 1d numpy array of float
+                    The fitness of each genome
+                played: 1d numpy array of int
+                    The number of rounds played by each genome
+
+            Returns
+            -------
+                1d numpy array of int
+                    The indices of the genomes from the best to the worst :
+                    the ones that survived more rounds first, then the
+                    greatest fitnesses
+        """
+        return np.lexsort((fitnesses, played))[::-1]
+
+    def _evaluate(self, ids, indices, round_index):
+        """
+            Computes one round of fitnesses, see _compute_fitnesses
+
+            The fitness tasks of all the genomes are given to the evaluator
+            at once. A population fitness is called once instead, with the
+            seed of the first task of the first genome (the seed of every
+            genome with seed_refresh set), see GeneticAlgorithmParameters.
+
+            Parameters
+            ----------
+                ids: 1d numpy array of int
+                    The ids of the evaluated genomes
+                indices: 1d numpy array of int
+                    The index of the evaluated genomes in the population
+                round_index: int
+                    The round of the evaluation
+
+            Returns
+            -------
+                1d numpy array of float
+                    The fitness of each evaluated genome
+        """
+        ids = [int(id) for id in ids]
+        population = self._population[indices]
+
+        if self._params.population_fitness is not None:
+            fitnesses = self._params.population_fitness(
+                ids, population, self._compute_seed(ids[0], round_index)
+            )
+            return np.asarray(fitnesses)
+
+        # One task per genome and task index, see GeneticAlgorithmParameters
+        tasks = self._params.tasks
+        task_ids = [id for id in ids for _ in range(0, tasks)]
+        genomes = [
+            population[j, :] for j in range(0, len(ids))
+            for _ in range(0, tasks)
+        ]
+        seeds = [
+            self._compute_seed(id, round_index, task)
+            for id in ids for task in range(0, tasks)
+        ]
+
+        if self._executor is None:
+            fitnesses = map(self._params.fitness, task_ids, genomes, seeds)
+        elif self._params.evaluator == "process":
+            fitnesses = self._executor.map(
+                _compute_fitness, task_ids, genomes, seeds
+            )
+        else:
+            fitnesses = self._executor.map(
+                self._params.fitness, task_ids, genomes, seeds
+            )
+
+        fitnesses = np.asarray(list(fitnesses), dtype=float)
+
+        return fitnesses.reshape(len(ids), tasks).mean(axis=1)
+
     def _crossover(self, genome1, genome2):
         """
             Perform crossover between two genomes
@@ -190,82 +498,90 @@ class GeneticAlgorithm:
         if not (population is None):
             self._population = population
 
-        for i in range(0, generations):
-            new_population = []        
+        # The pool is shut down even when the training is interrupted
+        self._executor = self._create_executor()
+
+        try:
+            for i in range(0, generations):
+                new_population = []        
 
-            # Compute fitnesses    
-            fitnesses = np.asarray([
-                self._params.fitness(i * self._params.population_size + j, self._population[j, :]) 
-                for j in range(0, self._params.population_size)
-            ])
+                # Compute fitnesses, generations are counted across calls
+                fitnesses, played = self._compute_fitnesses(
+                    len(self.stats.data)
+                )
+                ranking = self._rank(fitnesses, played)
             
-            self.stats.aggregate(self._population, fitnesses)
+                self.stats.aggregate(self._population, fitnesses, ranking)
 
-            # Choose best
-            max_fitnesses = fitnesses.argsort()[-self._params.elitism:][::-1]
+                # Choose best
+                max_fitnesses = ranking[:self._params.elitism]
         
-            # Add them to new population
-            for mf in max_fitnesses:
-                new_population.append(self._population[mf])
-
-            # Crossover only between best genes
-            crossover_elitist = self._params.random.randint(
-                0, self._params.elitism - 1, 
-                size = (self._params.reproduction_elitist, 2)
-            )
-
-            for parents in crossover_elitist:
-                children = self._crossover(
-                    self._population[max_fitnesses[parents[0]]], 
-                    self._population[max_fitnesses[parents[1]]]
+                # Add them to new population
+                for mf in max_fitnesses:
+                    new_population.append(self._population[mf])
+
+                # Crossover only between best genes
+                crossover_elitist = self._params.random.randint(
+                    0, self._params.elitism - 1, 
+                    size = (self._params.reproduction_elitist, 2)
                 )
 
-                new_population.append(children[0])
-            
-            # Random crossover of population
-            crossover_count = self._params.reproduction - \
-                              self._params.reproduction_elitist
+                for parents in crossover_elitist:
+                    children = self._crossover(
+                        self._population[max_fitnesses[parents[0]]], 
+                        self._population[max_fitnesses[parents[1]]]
+                    )
 
-            to_crossover    = self._params.random.randint(
-                0, self._params.population_size - 1, 
-                size = (crossover_count, 2)
-            )
+                    new_population.append(children[0])
+            
+                # Random crossover of population
+                crossover_count = self._params.reproduction - \
+                                  self._params.reproduction_elitist
 
-            # Perform crossovers
-            for parents in to_crossover:
-                children = self._crossover(
-                    self._population[parents[0]], 
-                    self._population[parents[1]]
+                to_crossover    = self._params.random.randint(
+                    0, self._params.population_size - 1, 
+                    size = (crossover_count, 2)
                 )
 
-                new_population.append(children[0])
-                # new_population.append(children[1])
-                
-            # Perform mutations
-            for i in range(len(new_population)):
-                for j in range(new_population[i].shape[0]):
-                    mutate = self._params.random.uniform()
-
-                    if mutate < self._params.mutation_rate:
-                        new_population[i][j] += self._params.random.normal(0, 0.1)
-
-            # Add new random genes
-            random_genes_count = self._params.population_size - len(new_population)
-            random_population = self._params.random.normal(
-                size = (random_genes_count, self._params.genes_count)
-            )
-
-            for i in range(0, random_genes_count):
-                new_population.append(random_population[i].tolist())
+                # Perform crossovers
+                for parents in to_crossover:
+                    children = self._crossover(
+                        self._population[parents[0]], 
+                        self._population[parents[1]]
+                    )
 
-            self._population = np.array(new_population)
+                    new_population.append(children[0])
+                    # new_population.append(children[1])
+                
+                # Perform mutations
+                for i in range(len(new_population)):
+                    for j in range(new_population[i].shape[0]):
+                        mutate = self._params.random.uniform()
+
+                        if mutate < self._params.mutation_rate:
+                            new_population[i][j] += self._params.random.normal(0, 0.1)
+
+                # Add new random genes
+                random_genes_count = self._params.population_size - len(new_population)
+                random_population = self._params.random.normal(
+                    size = (random_genes_count, self._params.genes_count)
+                )
 
-            print("****************")
-            print("Generation : ")
-            pp.pprint(self.stats.data[-1])
-            print("All time : ")
-            pp.pprint(self.stats.allTime)
-            print("****************")
+                for i in range(0, random_genes_count):
+                    new_population.append(random_population[i].tolist())
+
+                self._population = np.array(new_population)
+
+                print("****************")
+                print("Generation : ")
+                pp.pprint(self.stats.data[-1])
+                print("All time : ")
+                pp.pprint(self.stats.allTime)
+                print("****************")
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
 
         pp.pprint(self.stats.allTime)
         return self.stats
\ No newline at end of file
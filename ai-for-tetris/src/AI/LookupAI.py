@@ -1,19 +1,34 @@
 import itertools
 import numpy as np
+from collections import OrderedDict
 import copy
 import time
 import pprint
+import threading
+import warnings
 
 from src.AI.metrics import *
 
-from src.tetris.base.Controls import Controls
-from src.tetris.base.TetrisBase import TetrisBase
+from src.tetris.base.BatchTetris import BatchTetris
+from src.tetris.base.Engines import create_game
 from src.tetris.base.GameParameters import GameParameters
 
 from src.AI.GeneticAlgorithm import GeneticAlgorithm
 from src.AI.GeneticAlgorithm import GeneticAlgorithmParameters
 from src.AI.GeneticAlgorithm import GeneticAlgorithmStatistics 
 
+# Features weighted by default, in the order of the coefficients
+DEFAULT_FEATURES = ("aheight", "cleared", "holes", "bumpiness")
+
+# Features computed for each placement without building its board (see
+# metrics.compute_features_after), and all the available features
+DELTA_FEATURES = AFTER_FEATURES + ("cleared", )
+ALL_FEATURES = BOARD_FEATURES + PLACEMENT_FEATURES
+
+# Features computed for the hard drops of the lockstep training (see
+# LookupAI._population_fitness)
+LOCKSTEP_FEATURES = BOARD_FEATURES + PLACEMENT_FEATURES
+
 def best_of_if(first, second):
     """
         Tells which move is the best
@@ -75,14 +90,17 @@ class LookupAI:
     """
         AI that tries the best move possible among all others
 
-        Here, a move meets the following requirements : 
-            It only changes position or orientation in the first row (meaning 
-            that putting one piece below another is not possible)
+        Here, a move is any placement reachable by the current piece (see
+        TetrisBase.enumerate_placements), including the ones sliding a piece
+        below another.
 
         And best means : for a given metric, ignoring the upcomming piece
+        unless the lookahead is enabled. The metric is a weighted sum of
+        features (see ALL_FEATURES), one coefficient per feature.
     """
 
-    def __init__(self, gameparams, geneticparams):
+    def __init__(self, gameparams, geneticparams, features=DEFAULT_FEATURES,
+                 lookahead=False, top_k=4, table_size=0):
         """
             Ctor
 
@@ -90,62 +108,142 @@ class LookupAI:
             ----------
                 gameparams: src.tetris.base.GameParameters
                     The parameters used for the game. 
+                geneticparams: src.AI.GeneticAlgorithmParameters
+                    The parameters used for training, there is one gene per
+                    feature
+                features: sequence of str
+                    The weighted features, in the order of the coefficients,
+                    among ALL_FEATURES
+                lookahead: bool
+                    When true, the upcoming piece is also placed : a move is
+                    scored by the best board the next piece can lead to
+                top_k: int
+                    With the lookahead, the number of best moves (for the
+                    current piece only) whose next piece placements are tried
+                table_size: int
+                    The number of situations kept in the transposition table,
+                    0 to disable it (see _find_placements). An entry takes a
+                    few KB. Situations seldom repeat in a single game, hence
+                    the table is disabled by default and only used by train
         """
-
-        # Compute all moves possibles
-        self._gameparams    = gameparams
-        self._rotations = [
-            [], 
-            [Controls.ROTATE_LEFT], 
-            [Controls.ROTATE_RIGHT], 
-            [Controls.ROTATE_LEFT, 
-            Controls.ROTATE_LEFT]
+        for feature in features:
+            if feature not in ALL_FEATURES:
+                raise NameError("Undefined feature " + str(feature))
+
+        self._features = tuple(features)
+
+        # Features are computed from placement deltas when possible, see
+        # predict, and picked from the computed ones by index
+        self._use_deltas = all(f in DELTA_FEATURES for f in self._features)
+        self._delta_indices = [
+            DELTA_FEATURES.index(f) for f in self._features
+            if f in DELTA_FEATURES
         ]
-
+        self._all_indices = [ALL_FEATURES.index(f) for f in self._features]
+
+        # Whether features computed from the board, rather than from the
+        # statistics of the game (see TetrisBase.get_board_stats), are
+        # weighted
+        self._use_board = any(
+            f not in FEATURES + ("cleared", ) for f in self._features
+        )
+
+        self._lookahead = lookahead
+        self._top_k = top_k
+
+        # Transposition table : placements of a piece and their features in
+        # a given situation, least recently used first. Features are not
+        # weighted yet, hence the table is shared by all the coefficients
+        # (and the copies of the AI, see _fitness) along with the number of
+        # lookups and hits
+        self._table_size = table_size
+        self._table = OrderedDict()
+        self._table_counts = [0, 0]
+        self._table_lock = threading.Lock()
+
+        # Moves are enumerated by the game, see predict
+        self._gameparams    = gameparams
         self._tetris = None
-        self._combination = []
-
-        for ctrl in self._rotations:
-            self._combination.append(ctrl)
-            moves_left  = []
-            moves_right = []
-
-            for c in ctrl:
-                moves_left.append(c)
-                moves_right.append(c)
-
-            for i in range(0, int(gameparams.board_size[0] / 2)):
-                moves_left.append(Controls.LEFT)
-                moves_right.append(Controls.RIGHT)
-
-                self._combination.append(copy.deepcopy(moves_left))
-                self._combination.append(copy.deepcopy(moves_right))
 
         # Setup algorithm
         self._game_count = 100
         self._max_pieces = 100
-        self._coeffs = [0, 0, 0, 0]
+        self._coeffs = [0] * len(self._features)
 
         self._geneticparams = geneticparams
         self._geneticparams.genes_count = len(self._coeffs)
         self._geneticparams.fitness = self._fitness
         self._geneticalgorithm = GeneticAlgorithm(self._geneticparams)
 
-    def _fitness(self, id, genome):
+    def __getstate__(self):
+        """
+            Pickling support, for the process evaluator of the genetic
+            algorithm
+
+            The bound game, the transposition table and the genetic
+            algorithm are not pickled.
+        """
+        state = self.__dict__.copy()
+        state["_tetris"] = None
+        state["_table"] = OrderedDict()
+        state["_table_counts"] = [0, 0]
+        state["_table_lock"] = None
+        state["_geneticalgorithm"] = None
+
+        return state
+
+    def __setstate__(self, state):
+        """
+            Unpickling support, see __getstate__
+        """
+        self.__dict__.update(state)
+        self._table_lock = threading.Lock()
+
+    def _fitness(self, id, genome, seed=None):
+        """
+            Computes the fitness of a genome : its mean number of lines over
+            _game_count games of at most _max_pieces pieces
+
+            With several rounds of evaluation (see GeneticAlgorithmParameters)
+            the games are split between the rounds, and the games of a round
+            between its tasks : each call plays the games of one task (one
+            game when trained, see train and _compute_task_game_count).
+
+            The games are played by a copy of the AI sharing its transposition
+            table, hence genomes can be evaluated concurrently (see
+            GeneticAlgorithmParameters).
+
+            Parameters
+            ----------
+                id: int
+                    The id of the genome
+                genome: 1d array_like
+                    The coefficients to evaluate
+                seed: int or None
+                    The seed the seeds of the games are derived from, None for
+                    random games
+        """
         print("Computing fitness for genome no : ", id)
         print("Current genome : ", genome)
 
-        self._coeffs = genome 
+        ai = LookupAI.__new__(LookupAI)
+        ai.__dict__.update(self.__dict__)
+        ai._coeffs = genome
+
+        game_count = self._compute_task_game_count()
+        seeds = np.random.SeedSequence(seed).generate_state(game_count)
         line_count = 0
 
-        for i in range(0, self._game_count):
-            print("Game ", i, "/", self._game_count)
-            tetris = TetrisBase(self._gameparams)
-            self.bind(tetris)
+        for i in range(0, game_count):
+            print("Game ", i, "/", game_count)
+            params = copy.copy(self._gameparams)
+            params.seed = int(seeds[i])
+            tetris = create_game(params)
+            ai.bind(tetris)
 
             piece_count = 0
             while (not tetris._is_over) and piece_count < self._max_pieces:
-                moves = self.predict(None)
+                moves = ai.predict(None)
 
                 for m in moves:
                     tetris.tick(m)
@@ -154,23 +252,159 @@ class LookupAI:
             
             line_count += tetris._lines_count
 
-        return line_count / self._game_count
+        print("Transposition table : ", len(self._table), " entries, hit "
+              "rate : ", round(self.get_table_hit_rate(), 3))
 
-    def _best_of(self, first, second):
-        first_score = self._coeffs[0] * first["aheight"] + \
-                      self._coeffs[1] * first["cleared"] + \
-                      self._coeffs[2] * first["holes"]   + \
-                      self._coeffs[3] * first["bumpiness"]
-        
-        second_score = self._coeffs[0] * second["aheight"] + \
-                       self._coeffs[1] * second["cleared"] + \
-                       self._coeffs[2] * second["holes"]   + \
-                       self._coeffs[3] * second["bumpiness"]
-        
-        if first_score > second_score:
-            return first
-        
-        return second
+        return line_count / game_count
+
+    def _compute_round_game_count(self):
+        """
+            Returns the number of games of a round of evaluation, see
+            _fitness
+
+            Returns
+            -------
+                int
+                    The number of games, such that a genome evaluated in all
+                    the rounds plays at least _game_count games
+        """
+        rounds = self._geneticparams.rounds
+
+        return (self._game_count + rounds - 1) // rounds
+
+    def _compute_task_game_count(self):
+        """
+            Returns the number of games of a fitness task, see _fitness
+
+            Returns
+            -------
+                int
+                    The number of games, such that the tasks of a round play
+                    at least the games of the round
+        """
+        tasks = self._geneticparams.tasks
+
+        return (self._compute_round_game_count() + tasks - 1) // tasks
+
+    def _population_fitness(self, ids, population, seed=None):
+        """
+            Computes the fitness of a whole population at once, see _fitness
+
+            Every genome plays the same games (the games of a round, see
+            _fitness), all the games of the population being played in
+            lockstep (see BatchTetris) : the features of the candidate boards
+            of every game are computed as one array per piece and scored by
+            all the genomes in a single product.
+
+            Only hard drops are tried (see TetrisBase.enumerate_drops),
+            without lookahead, and the cleared feature is the number of lines
+            cleared by a drop. The features must be among LOCKSTEP_FEATURES,
+            see train.
+
+            Parameters
+            ----------
+                ids: list of int
+                    The ids of the genomes
+                population: 2d array_like
+                    The (P, F) coefficients of each genome
+                seed: int or None
+                    The seed the seeds of the games are derived from, None for
+                    random games
+
+            Returns
+            -------
+                1d numpy array of float
+                    The fitness of each genome
+        """
+        print("Computing fitness for genomes no : ", ids[0], "-", ids[-1])
+
+        coeffs = np.asarray(population, dtype=float)
+        genomes_count = coeffs.shape[0]
+
+        # Game g of genome p is game p * game_count + g of the batch
+        game_count = self._compute_round_game_count()
+        seeds = np.random.SeedSequence(seed).generate_state(game_count)
+        count = genomes_count * game_count
+        batch = BatchTetris(
+            self._gameparams, count,
+            seeds=np.tile(seeds, genomes_count),
+            max_pieces=self._max_pieces, auto_reset=False
+        )
+
+        rotations = np.zeros(count, dtype=np.int64)
+        columns = np.zeros(count, dtype=np.int64)
+
+        while not batch.is_over().all():
+            games = np.flatnonzero(~batch.is_over())
+            states, drops, valid = batch.enumerate_drops(games)
+            boards, lines, fits, middles, cells = batch.try_drops(
+                games, states, drops
+            )
+            boards = boards.reshape((-1, ) + boards.shape[2:])
+
+            if self._use_board:
+                features = compute_board_features_batch(boards)
+            else:
+                features = compute_features_batch(boards)
+
+            names = BOARD_FEATURES[:features.shape[1]] + PLACEMENT_FEATURES
+            values = np.column_stack(
+                (features, lines.ravel(), middles.ravel(),
+                 (lines * cells).ravel())
+            )
+            values = values[:, [names.index(f) for f in self._features]]
+            values = values.reshape(lines.shape + (len(self._features), ))
+
+            # Each game is scored with the coefficients of its genome
+            scores = np.einsum(
+                "kcf,kf->kc", values, coeffs[games // game_count]
+            )
+            scores[~(valid & fits)] = -np.inf
+
+            # Last best drop, as predict does
+            best = scores.shape[1] - 1 - np.argmax(scores[:, ::-1], axis=1)
+            rotations[games] = states[np.arange(games.shape[0]), best]
+            columns[games] = drops[np.arange(games.shape[0]), best]
+
+            batch.place(rotations, columns)
+
+        lines = batch.get_stats()["lines"].reshape(genomes_count, -1)
+
+        return lines.mean(axis=1)
+
+    def _evaluate(self, values):
+        """
+            Scores candidate moves
+
+            Parameters
+            ----------
+                values: 2d array_like
+                    The features of each move, in the order of the
+                    coefficients
+
+            Returns
+            -------
+                1d numpy array of float
+                    The score of each move, the greater the better
+        """
+        return np.asarray(values) @ np.asarray(self._coeffs, dtype=float)
+
+    def get_table_hit_rate(self):
+        """
+            Returns the hit rate of the transposition table
+
+            Returns
+            -------
+                float
+                    The fraction of the lookups that found their situation
+                    in the table, 0 before any lookup
+        """
+        lookups, hits = self._table_counts
+
+        if lookups == 0:
+            return 0.0
+
+        return hits / lookups
 
     def bind(self, tetris):
         """
@@ -178,16 +412,67 @@ class LookupAI:
         """
         self._tetris = tetris
     
-    def train(self, generations, game_count, piece_count):
+    def train(self, generations, game_count, piece_count, lockstep=False,
+              table_size=8192):
+        """
+            Trains the coefficients with the genetic algorithm
+
+            Parameters
+            ----------
+                generations: int
+                    The number of generations
+                game_count: int
+                    The number of games played by each genome, see _fitness
+                piece_count: int
+                    The maximum number of pieces of a game
+                lockstep: bool
+                    Whether the whole population plays at once, see
+                    _population_fitness. The games are then played with hard
+                    drops only and without lookahead : the coefficients fit
+                    this play, which differs from predict (reachable
+                    placements, slides and spins included). The features
+                    must be among LOCKSTEP_FEATURES, otherwise a ValueError
+                    is raised
+                table_size: int
+                    The size of the transposition table during the training,
+                    see the constructor. It is not used in lockstep
+        """
+        if lockstep:
+            unsupported = [
+                f for f in self._features if f not in LOCKSTEP_FEATURES
+            ]
+            if len(unsupported) != 0:
+                raise ValueError("Features not computed in lockstep : " +
+                                 str(unsupported))
+
+            if self._lookahead:
+                warnings.warn("The lockstep training ignores the lookahead, "
+                              "the coefficients are fit to drops only")
+
         self._game_count = game_count
         self._max_pieces = piece_count
+
+        # Genomes replay the same games, hence the same situations : the
+        # transposition table is only used (and kept) while training
+        previous_size, self._table_size = self._table_size, table_size
+
+        # The whole population plays at once, see _population_fitness.
+        # Otherwise each game is a fitness task of its own, so that the
+        # evaluator spreads the games of a genome between its workers
+        self._geneticparams.population_fitness = \
+            self._population_fitness if lockstep else None
+        self._geneticparams.tasks = self._compute_round_game_count()
         
-        stats = self._geneticalgorithm.train(generations)
+        try:
+            stats = self._geneticalgorithm.train(generations)
+        finally:
+            self._table_size = previous_size
+            self._table.clear()
 
         pp = pprint.PrettyPrinter(indent = 4)
         pp.pprint(stats)
 
-    def predict(self, board):
+    def predict(self, board, deadline_ms=None):
         """
             Makes a prediction
 
@@ -198,54 +483,337 @@ class LookupAI:
             ----------
                 board: 2d array_like
                     Unused. Board infos are accessed through the bounded game
+                deadline_ms: float or None
+                    The time given to the prediction in milliseconds, see plan
         """
-        pp = pprint.PrettyPrinter(indent = 4)
-
         if self._tetris is None:
             raise EnvironmentError("Binds the AI to a game first")
 
-        default = {
-            "moves":        [],
-            "lines":    -10000,
-            "score":    -10000,
-            "bumpiness": 10000,
-            "holes":     10000,
-            "height":    10000,
-            "aheight":   10000,
-            "cleared":  -10000 
-        }
-
-        best = copy.deepcopy(default)
-
-        current_lines = self._tetris._lines_count
-        ts = time.time()
-        for moves in self._combination:
-            m, board_, lines, score = self._tetris.try_moves(moves)
-            
-            holes      = compute_holes(board_)
-            height     = compute_height(board_)
-            bumpiness  = compute_bumpiness(board_)
-            aggregated_height = compute_sum_height(board_)
-
-            current = {
-                "moves": m,
-                "holes": holes, 
-                "lines": lines, 
-                "score": score, 
-                "height": height,
-                "aheight": aggregated_height,
-                "cleared": lines - current_lines, 
-                "bumpiness": bumpiness
-            }
-
-            if best == default:
-                best = current
+        return self.plan(self._tetris, deadline_ms)
+
+    def plan(self, tetris, deadline_ms=None):
+        """
+            Computes the moves of the current piece of a game
+
+            The game does not need to be bound, hence moves can be planned
+            on a copy of the game (see TetrisBase.get_copy), for instance in
+            another thread. The game is left unchanged.
+
+            With a deadline, the search is anytime : the placements of the
+            current piece are searched and scored first, then the best ones
+            are looked ahead (see _look_ahead) one after the other, from the
+            best, until the deadline. The lookahead then goes beyond top_k
+            moves when time allows, and is done even if it is not enabled.
+            When the deadline is reached during the search of the placements,
+            the best placement found so far is played (see
+            TetrisBase.search_placements).
+
+            Parameters
+            ----------
+                tetris: TetrisBase
+                    The game
+                deadline_ms: float or None
+                    The time given to the prediction in milliseconds, None for
+                    no deadline. It can be overshot by the replay of one
+                    placement or one drop (see _compute_values)
+
+            Returns
+            -------
+                list of tetris.base.Controls.Controls
+                    The moves placing the current piece, empty when the game
+                    is over
+        """
+        deadline = None
+        if deadline_ms is not None:
+            deadline = time.perf_counter() + deadline_ms / 1000
+
+        placements, parents, scores, traced = self._find_placements(
+            tetris, tetris._lines_count, deadline=deadline
+        )
+
+        if len(placements) == 0:
+            return []
+
+        if self._lookahead or deadline is not None:
+            scores = self._look_ahead(tetris, placements, scores, deadline)
+
+        # Last best move, as when comparing the moves one by one
+        best = len(scores) - 1 - np.argmax(scores[::-1])
+
+        # Only the moves of the chosen placement are built, and kept with
+        # the placements. The search is done again up to the placement when
+        # the placements come from the table
+        moves = traced.get(best)
+        if moves is None:
+            if parents is None:
+                _, parents = tetris.search_placements(target=placements[best])
+
+            moves = tuple(tetris.trace_moves(parents, placements[best]))
+            traced[best] = moves
+
+        return list(moves)
+
+    def _find_placements(self, tetris, lines_count, drops=False,
+                         deadline=None):
+        """
+            Enumerates and scores the placements of the current piece
+
+            Placements and their features are looked up in the transposition
+            table first. A situation is the filled cells of the board (see
+            TetrisBase.get_board_key), the current piece with its state and
+            position and the lines cleared since the beginning of the move.
+            Only the placements, their features and the moves traced so far
+            are kept, not the parents of the search.
+
+            Parameters
+            ----------
+                tetris: TetrisBase
+                    The game
+                lines_count: int
+                    The number of lines of the game when the move to score
+                    started, see _compute_values
+                drops: bool
+                    Whether drops (see TetrisBase.enumerate_drops) are
+                    enumerated instead of reachable placements (see
+                    TetrisBase.search_placements)
+                deadline: float or None
+                    When given, the search of reachable placements and their
+                    scoring stop at this time (see TetrisBase.search_placements
+                    and _compute_values). Results that may have been
+                    interrupted are not kept in the table
+
+            Returns
+            -------
+                list of tuple, dict or None, 1d numpy array of float, dict
+                    The placements, the parents to build their moves from
+                    (see TetrisBase.trace_moves, None for drops and for
+                    placements found in the table), their scores (see
+                    _evaluate), -inf for drops not fitting in the board, and
+                    the moves already traced by placement index, to be
+                    completed by the caller
+        """
+        key = None
+        entry = None
+
+        if self._table_size > 0:
+            piece = tetris._current_piece
+            key = (
+                tetris.get_board_key(), piece.get_signature(),
+                piece.get_state_index(), tetris._current_pos,
+                tetris._lines_count - lines_count, drops
+            )
+
+            with self._table_lock:
+                self._table_counts[0] += 1
+                entry = self._table.get(key)
+
+                if entry is not None:
+                    self._table_counts[1] += 1
+                    self._table.move_to_end(key)
+
+        if entry is None:
+            if drops:
+                placements, parents = tetris.enumerate_drops(), None
             else:
-                best = self._best_of(best, current)
-        
-        #print("Computing best took : ", time.time() - ts)
+                placements, parents = tetris.search_placements(deadline)
+
+            values, blocked = self._compute_values(
+                tetris, placements, lines_count, drops, deadline
+            )
+            if deadline is not None and time.perf_counter() >= deadline:
+                key = None
+
+            entry = (placements, values, blocked, {})
+
+            if key is not None:
+                with self._table_lock:
+                    self._table[key] = entry
+
+                    if len(self._table) > self._table_size:
+                        self._table.popitem(last=False)
+        else:
+            parents = None
+
+        placements, values, blocked, traced = entry
+
+        scores = self._evaluate(values)
+        scores[blocked] = -np.inf
+
+        return placements, parents, scores, traced
+
+    def _compute_values(self, tetris, placements, lines_count, drops,
+                        deadline=None):
+        """
+            Computes the features of the placements of the current piece
+
+            Parameters
+            ----------
+                tetris: TetrisBase
+                    The game
+                placements: list of tuple
+                    The placements, see TetrisBase.search_placements, or the
+                    drops, see TetrisBase.enumerate_drops
+                lines_count: int
+                    The number of lines of the game when the move to score
+                    started, cleared lines are counted from it
+                drops: bool
+                    Whether placements are drops
+                deadline: float or None
+                    When given, the placements are no longer replayed after
+                    this time (see time.perf_counter), once one of them is.
+                    The placements left are then ignored like the drops not
+                    fitting in the board
+
+            Returns
+            -------
+                2d numpy array of float, list of int
+                    The features of each placement, in the order of the
+                    coefficients, and the indices of the drops not fitting in
+                    the board (and of the placements left at the deadline)
+        """
+        heights, holes, row_fills = tetris.get_board_stats()
+        piece = tetris._current_piece
+
+        if len(placements) == 0:
+            return np.zeros((0, len(self._features))), []
+
+        # Top left corner of the piece, boundaries excluded
+        if drops:
+            states, columns = zip(*placements)
+            rows = None
+        else:
+            states = [state for state, _ in placements]
+            bounds = [piece.compute_bounds(state)[0] for state in states]
+            rows = [pos[1] + b[0] for (_, pos), b in zip(placements, bounds)]
+            columns = [
+                pos[0] + b[2] - 1 for (_, pos), b in zip(placements, bounds)
+            ]
+
+        # Every placement is scored at once, only the ones clearing lines
+        # (their features depend on the removed rows) or weighting other
+        # features are then played one by one
+        features, lines, rows = compute_features_after(
+            heights, holes, row_fills, piece, states, rows, columns,
+            tetris._board[:-1, 1:-1] if self._use_board else None
+        )
+        blocked = np.flatnonzero(rows < 0)
+
+        # Lines cleared since the beginning of the move (lookahead)
+        cleared = tetris._lines_count - lines_count
+
+        if self._use_deltas:
+            features = np.column_stack(
+                [features, np.full(len(placements), cleared)]
+            )
+            remaining = np.flatnonzero((lines != 0) & (rows >= 0))
+        else:
+            values = np.zeros((len(placements), len(self._features)))
+            remaining = np.flatnonzero(rows >= 0)
+
+        for count, index in enumerate(remaining):
+            if deadline is not None and count != 0 and \
+                    time.perf_counter() >= deadline:
+                blocked = np.union1d(blocked, remaining[count:])
+                break
+
+            state, row = states[index], rows[index]
+
+            if not self._use_deltas:
+                placement_features = compute_placement_features(
+                    heights, row_fills, piece, state, row
+                )
+
+            tetris.push()
+
+            if drops:
+                tetris.place(state, columns[index])
+            else:
+                tetris.lock_placement(placements[index])
+
+            # Only the board features change, the statistics of the game
+            # are enough unless other features are weighted
+            if self._use_deltas:
+                if self._use_board:
+                    board_features = compute_board_features(
+                        tetris._board[:-1, 1:-1]
+                    )[:len(AFTER_FEATURES) - 2]
+                else:
+                    board_features = compute_features_from_stats(
+                        *tetris.get_board_stats()[:2]
+                    )
+
+                features[index, :len(board_features)] = board_features
+                features[index, -1] = tetris._lines_count - lines_count
+            else:
+                features = compute_board_features(tetris._board[:-1, 1:-1])
+                features += (cleared + placement_features[0], ) + \
+                    placement_features[1:]
+                values[index] = [features[i] for i in self._all_indices]
+
+            tetris.pop()
+
+        if self._use_deltas:
+            values = features[:, self._delta_indices]
+
+        return values, list(blocked)
+
+    def _look_ahead(self, tetris, placements, scores, deadline=None):
+        """
+            Scores the best placements with the next piece
+
+            The top_k best placements are played, then each one gets the
+            score of the best drop of the next piece (see
+            TetrisBase.enumerate_drops, drops are much cheaper to enumerate
+            than reachable placements). The other placements, and the ones
+            ending the game, are ignored.
+
+            Parameters
+            ----------
+                tetris: TetrisBase
+                    The game
+                placements: list of tuple
+                    The placements of the current piece
+                scores: 1d numpy array of float
+                    Their scores, see _find_placements
+                deadline: float or None
+                    When given, placements are looked ahead from the best one
+                    until this time (see time.perf_counter) instead of the
+                    top_k best ones. The placement being looked ahead at this
+                    time is ignored
+
+            Returns
+            -------
+                1d numpy array of float
+                    The new scores, -inf for ignored placements. The scores
+                    are returned unchanged when every placement is ignored
+        """
+        lines_count = tetris._lines_count
+
+        combined = np.full(len(scores), -np.inf)
+        best = np.argsort(-scores, kind="stable")
+
+        if deadline is None:
+            best = best[:self._top_k]
+
+        for i in best:
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+
+            tetris.push()
+            tetris.lock_placement(placements[i])
+
+            if not tetris._is_over:
+                _, _, drop_scores, _ = self._find_placements(
+                    tetris, lines_count, drops=True, deadline=deadline
+                )
+
+                # Drops may have been left unscored
+                if deadline is None or time.perf_counter() < deadline:
+                    combined[i] = np.max(drop_scores)
+
+            tetris.pop()
 
-        #print("=========== Best ================")
-        #pp.pprint(best)
+        if np.all(np.isinf(combined)):
+            return scores
 
-        return best["moves"]
\ No newline at end of file
+        return combined
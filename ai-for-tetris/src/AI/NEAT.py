@@ -11,7 +11,7 @@ from src.AI.visualize import plot_stats
 from src.AI.visualize import plot_species
 
 from src.tetris.base.Controls import Controls
-from src.tetris.base.TetrisBase import TetrisBase
+from src.tetris.base.Engines import create_game
 from src.tetris.base.GameParameters import GameParameters
 
 def softmax(x):
@@ -120,7 +120,7 @@ class NEATAI:
             # Create neural network
             net = neat.nn.FeedForwardNetwork.create(genome, config)
 
-            tetris = TetrisBase(self._params)
+            tetris = create_game(self._params)
             
             pieces_count = 0
             action_count  = 0
@@ -160,10 +160,8 @@ class NEATAI:
                         break
 
                 new_board = tetris._board[:-1, 1:-1]
-                a = compute_sum_height(new_board)
+                h, _, a, b = compute_features(new_board)
                 c = tetris._lines_count - start_lines
-                h = compute_holes(new_board)
-                b = compute_bumpiness(new_board)
 
                 metric =  -0.5 * a + 0.7 * c - 0.35 * h - 0.18 * b
                 genome.fitness += metric
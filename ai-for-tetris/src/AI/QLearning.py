@@ -2,7 +2,7 @@ import numpy as np
 import copy
 
 from src.tetris.base.Controls import Controls
-from src.tetris.base.TetrisBase import TetrisBase
+from src.tetris.base.Engines import create_game
 from src.tetris.base.GameParameters import GameParameters
 
 from src.AI.metrics import *
@@ -97,10 +97,8 @@ class QLearningAI:
         if lines != new_lines:
             return 10000
 
-        a = compute_sum_height(new_board)
+        h, _, a, b = compute_features(new_board)
         c = new_lines - lines
-        h = compute_holes(new_board)
-        b = compute_bumpiness(new_board)
 
         return -0.5 * a + 0.7 * c - 0.35 * h - 0.18 * b
 
@@ -124,7 +122,7 @@ class QLearningAI:
 
         try:
             while (game_index < game_count) and (it_index < max_it):
-                tetris = TetrisBase(self._gameparams)
+                tetris = create_game(self._gameparams)
 
                 while not tetris._is_over:
                     statesactions = []
@@ -153,7 +151,12 @@ class QLearningAI:
                         else:
                             action = np.argmax(self._qtable[state])
                         
-                        tetris.tick(self._ctrls[action])
+                        if self._ctrls[action] is Controls.NOTHING:
+                            # The board cannot change before the next gravity
+                            # step, idle ticks are skipped
+                            tetris.advance_until_event()
+                        else:
+                            tetris.tick(self._ctrls[action])
                         
                         # New state
                         new_board = tetris.get_current_game_state()
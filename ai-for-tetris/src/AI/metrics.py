@@ -1,63 +1,602 @@
 import numpy as np
 
-def compute_holes(board):
+# Features returned by compute_features, in order
+FEATURES = ("holes", "height", "aheight", "bumpiness")
+
+# Features returned by compute_board_features, in order : the features above
+# then the ones of Dellacherie and BCTS controllers
+BOARD_FEATURES = FEATURES + (
+    "row_transitions",
+    "column_transitions",
+    "wells",
+    "hole_depth",
+    "rows_with_holes"
+)
+
+# Features of a placement rather than of a board, returned by
+# compute_placement_features, in order
+PLACEMENT_FEATURES = ("cleared", "landing_height", "eroded_cells")
+
+# Features returned by compute_features_after, in order
+AFTER_FEATURES = FEATURES + (
+    "row_transitions",
+    "column_transitions",
+    "wells",
+    "landing_height",
+    "eroded_cells"
+)
+
+def compute_column_heights(board):
     """
-        Compute the number of holes in the board
+        Compute the height of each column of the board
 
-        Note: a hole is defined as an empty cell with a block one or more 
-        blocks above
+        The height of a column is the number of rows between the bottom of
+        the board and its highest block (included), 0 for an empty column.
+
+        Parameters
+        ----------
+            board: 2d or 3d array_like
+                The tetris board, or a stack of boards
+
+        Returns
+        -------
+            1d or 2d numpy array of int
+                The height of each column (of each board)
+    """
+    filled = np.asarray(board) != 0
+    tops = np.argmax(filled, axis=-2)
+
+    return np.where(filled.any(axis=-2), filled.shape[-2] - tops, 0)
+
+def compute_features(board):
+    """
+        Compute all the features of the board at once
+
+        Column heights are computed once and every feature is derived from
+        them : a column holds height - blocks holes.
 
         Parameters
         ----------
             board: 2d array_like
                 The tetris board
+
+        Returns
+        -------
+            tuple of int
+                The features listed in FEATURES : holes, maximum height,
+                aggregated height and bumpiness
     """
-    holes = 0
-    size = board.shape
+    filled = np.asarray(board) != 0
+    tops = np.argmax(filled, axis=0)
+    heights = np.where(filled.any(axis=0), filled.shape[0] - tops, 0)
 
-    for j in range(0, board.shape[1]):
-        is_one = False
+    aggregated_height = int(heights.sum())
 
-        for e in board[:, j]:
-            if is_one and e == 0:
-                holes += 1
-            elif e == 1:
-                is_one = True
+    return (
+        aggregated_height - int(np.count_nonzero(filled)),
+        int(heights.max()),
+        aggregated_height,
+        int(np.abs(np.diff(heights)).sum())
+    )
 
-    return holes
+def compute_features_batch(boards):
+    """
+        Compute all the features of a stack of boards at once
 
-def compute_height(board):
+        Parameters
+        ----------
+            boards: 3d array_like
+                The K boards of the same size, such as all the boards a piece
+                can lead to
+
+        Returns
+        -------
+            2d numpy array of int
+                A (K, F) matrix whose rows are the features of each board, in
+                the order of FEATURES
     """
-        Compute the maximum height of the board
+    filled = np.asarray(boards) != 0
+    tops = np.argmax(filled, axis=1)
+    heights = np.where(filled.any(axis=1), filled.shape[1] - tops, 0)
+
+    aggregated_height = heights.sum(axis=1)
+
+    return np.stack([
+        aggregated_height - np.count_nonzero(filled, axis=(1, 2)),
+        heights.max(axis=1),
+        aggregated_height,
+        np.abs(np.diff(heights, axis=1)).sum(axis=1)
+    ], axis=1)
+
+def compute_board_features(board):
+    """
+        Compute all the board features at once
+
+        The features of compute_features are completed with :
+            row_transitions: the number of filled / empty changes along the
+                rows, boundaries being filled
+            column_transitions: the number of filled / empty changes along
+                the columns, the floor being filled
+            wells: the sum of 1 + 2 + ... + depth over all wells, the depth
+                of the well of a column being how far it is below both of
+                its neighbours (boundaries being as high as the board)
+            hole_depth: the sum, over all holes, of the number of blocks
+                above the hole
+            rows_with_holes: the number of rows with at least one hole
 
         Parameters
         ----------
             board: 2d array_like
                 The tetris board
+
+        Returns
+        -------
+            tuple of int
+                The features listed in BOARD_FEATURES
+    """
+    filled = np.asarray(board) != 0
+    size = filled.shape
+
+    tops = np.argmax(filled, axis=0)
+    heights = np.where(filled.any(axis=0), size[0] - tops, 0)
+    aggregated_height = int(heights.sum())
+
+    # Empty cells below the highest block of their column
+    below_top = np.arange(size[0])[:, None] >= size[0] - heights
+    holes = below_top & ~filled
+
+    walls = np.ones((size[0], 1), dtype=bool)
+    rows = np.hstack([walls, filled, walls])
+    columns = np.vstack([filled, np.ones((1, size[1]), dtype=bool)])
+
+    sides = np.concatenate([[size[0]], heights, [size[0]]])
+    depths = np.maximum(np.minimum(sides[:-2], sides[2:]) - heights, 0)
+
+    return (
+        aggregated_height - int(np.count_nonzero(filled)),
+        int(heights.max()),
+        aggregated_height,
+        int(np.abs(np.diff(heights)).sum()),
+        int(np.count_nonzero(rows[:, 1:] != rows[:, :-1])),
+        int(np.count_nonzero(columns[1:] != columns[:-1])),
+        int((depths * (depths + 1) // 2).sum()),
+        int(np.cumsum(filled, axis=0)[holes].sum()),
+        int(np.count_nonzero(holes.any(axis=1)))
+    )
+
+def compute_board_features_batch(boards):
+    """
+        Compute all the board features of a stack of boards at once
+
+        Parameters
+        ----------
+            boards: 3d array_like
+                The K boards of the same size, such as all the boards a piece
+                can lead to
+
+        Returns
+        -------
+            2d numpy array of int
+                A (K, F) matrix whose rows are the features of each board, in
+                the order of BOARD_FEATURES, see compute_board_features
+    """
+    filled = np.asarray(boards) != 0
+    count, height, width = filled.shape
+
+    tops = np.argmax(filled, axis=1)
+    heights = np.where(filled.any(axis=1), height - tops, 0)
+    aggregated_height = heights.sum(axis=1)
+
+    below_top = np.arange(height)[None, :, None] >= \
+        height - heights[:, None, :]
+    holes = below_top & ~filled
+
+    walls = np.ones((count, height, 1), dtype=bool)
+    rows = np.concatenate([walls, filled, walls], axis=2)
+    columns = np.concatenate(
+        [filled, np.ones((count, 1, width), dtype=bool)], axis=1
+    )
+
+    sides = np.full((count, width + 2), height)
+    sides[:, 1:-1] = heights
+    depths = np.maximum(
+        np.minimum(sides[:, :-2], sides[:, 2:]) - heights, 0
+    )
+
+    return np.stack([
+        aggregated_height - np.count_nonzero(filled, axis=(1, 2)),
+        heights.max(axis=1),
+        aggregated_height,
+        np.abs(np.diff(heights, axis=1)).sum(axis=1),
+        np.count_nonzero(rows[:, :, 1:] != rows[:, :, :-1], axis=(1, 2)),
+        np.count_nonzero(columns[:, 1:] != columns[:, :-1], axis=(1, 2)),
+        (depths * (depths + 1) // 2).sum(axis=1),
+        (np.cumsum(filled, axis=1) * holes).sum(axis=(1, 2)),
+        np.count_nonzero(holes.any(axis=2), axis=1)
+    ], axis=1)
+
+def compute_placement_features(heights, row_fills, piece, state, row):
+    """
+        Compute the features of a placement
+
+        The features are :
+            cleared: the number of lines cleared by the placement
+            landing_height: the height of the middle of the piece, from the
+                floor (before any line is cleared)
+            eroded_cells: the number of cleared lines times the number of
+                cells of the piece they contained
+
+        Parameters
+        ----------
+            heights: sequence of int
+                The height of each column of the board
+            row_fills: sequence of int
+                The number of blocks of each row of the board before the
+                placement, from top to bottom
+            piece: tetris.base.Piece
+                The placed piece
+            state: int
+                The state of the placed piece
+            row: int
+                The row of the top of the bounding box of the piece
+
+        Returns
+        -------
+            tuple of int, float and int
+                The features listed in PLACEMENT_FEATURES
+    """
+    height = len(row_fills)
+    width = len(heights)
+    indices, _, _, row_cells = piece.compute_cell_counts(state)
+
+    cleared = 0
+    piece_cells = 0
+
+    for r, cells in enumerate(row_cells):
+        if row_fills[row + r] + cells == width:
+            cleared += 1
+            piece_cells += cells
+
+    bottom = row + indices[1] - indices[0]
+    landing_height = (2 * height - row - bottom) / 2
+
+    return cleared, landing_height, cleared * piece_cells
+
+def compute_features_from_stats(heights, holes):
+    """
+        Compute the features of a board from its column statistics
+
+        Parameters
+        ----------
+            heights: sequence of int
+                The height of each column, see compute_column_heights
+            holes: sequence of int
+                The number of holes of each column
+
+        Returns
+        -------
+            tuple of int
+                The features listed in FEATURES, as compute_features
+    """
+    return (
+        sum(holes),
+        max(heights),
+        sum(heights),
+        sum(abs(heights[c + 1] - heights[c]) for c in range(len(heights) - 1))
+    )
+
+def compute_landing_row(heights, board_height, piece, state, column):
+    """
+        Compute where a piece dropped from the top of a board lands
+
+        Parameters
+        ----------
+            heights: sequence of int
+                The height of each column of the board
+            board_height: int
+                The number of rows of the board
+            piece: tetris.base.Piece
+                The dropped piece
+            state: int
+                The state of the dropped piece
+            column: int
+                The column of the left of the bounding box of the piece
+
+        Returns
+        -------
+            int
+                The row of the top of the bounding box of the piece once
+                landed, -1 when the piece does not fit in the board : as in
+                TetrisBase.place, when the whole state of the piece (the
+                empty rows above its bounding box included) does not fit
+    """
+    indices, bottoms = piece.compute_bottom_profile(state)
+
+    row = min(
+        board_height - heights[column + c] - bottom - 1
+        for c, bottom in enumerate(bottoms) if bottom >= 0
+    )
+
+    return row if row >= indices[0] else -1
+
+def compute_features_delta(heights, row_fills, piece, state, row, column):
+    """
+        Compute how placing a piece changes the features of a board
+
+        Only the columns covered by the piece (and their neighbours for the
+        bumpiness) are looked at, the resulting board is never built. In a
+        column, the cells between the previous highest block and the lowest
+        cell of the piece become holes, and a piece cell below the highest
+        block (after a slide) fills a hole.
+
+        Parameters
+        ----------
+            heights: sequence of int
+                The height of each column of the board
+            row_fills: sequence of int
+                The number of blocks of each row of the board, from top to
+                bottom
+            piece: tetris.base.Piece
+                The placed piece
+            state: int
+                The state of the placed piece
+            row: int or None
+                The row of the top of the bounding box of the piece, None to
+                drop the piece from the top of the board
+            column: int
+                The column of the left of the bounding box of the piece
+
+        Returns
+        -------
+            tuple of int or None, int
+                The change of each feature listed in FEATURES and the number
+                of cleared lines. When lines are cleared the features depend
+                on the content of the removed rows and None is returned
+                instead of the changes
+    """
+    height = len(row_fills)
+    width = len(heights)
+    indices, tops, column_cells, row_cells = piece.compute_cell_counts(state)
+
+    if row is None:
+        row = compute_landing_row(heights, height, piece, state, column)
+
+        if row < 0:
+            raise ValueError("The piece does not fit in column " +
+                             str(column))
+
+    cleared = 0
+    for r, cells in enumerate(row_cells):
+        if row_fills[row + r] + cells == width:
+            cleared += 1
+
+    if cleared != 0:
+        return None, cleared
+
+    # Window of columns whose bumpiness may change
+    start = max(column - 1, 0)
+    end = min(column + len(tops) + 1, width)
+    new_heights = list(heights[start:end])
+
+    holes = 0
+    for c, top in enumerate(tops):
+        if top < 0:
+            continue
+
+        old_height = heights[column + c]
+        new_height = max(old_height, height - row - top)
+
+        holes += new_height - old_height - column_cells[c]
+        new_heights[column + c - start] = new_height
+
+    bumpiness = 0
+    for c in range(len(new_heights) - 1):
+        bumpiness += abs(new_heights[c + 1] - new_heights[c]) - \
+            abs(heights[start + c + 1] - heights[start + c])
+
+    aggregated_height = sum(new_heights) - sum(heights[start:end])
+    max_height = max(0, max(new_heights) - max(heights))
+
+    return (holes, max_height, aggregated_height, bumpiness), 0
+
+def compute_features_after(heights, holes, row_fills, piece, states, rows,
+                           columns, board=None):
+    """
+        Compute the features of the boards a piece leads to, for many
+        placements of the piece at once
+
+        This is compute_features_delta vectorized over the placements : the
+        columns covered by the piece get their new height and holes, then the
+        features are computed from the new heights of each board. Only the
+        rows and columns covered by the piece are read from the board, to
+        update its transitions.
+
+        Parameters
+        ----------
+            heights: sequence of int
+                The height of each column of the board
+            holes: sequence of int
+                The number of holes of each column of the board
+            row_fills: sequence of int
+                The number of blocks of each row of the board, from top to
+                bottom
+            piece: tetris.base.Piece
+                The placed piece
+            states: 1d array_like of int
+                The state of the piece for each placement
+            rows: 1d array_like of int or None
+                The row of the top of the bounding box of the piece for each
+                placement, None to drop the piece from the top of the board
+            columns: 1d array_like of int
+                The column of the left of the bounding box of the piece for
+                each placement
+            board: 2d array_like or None
+                The tetris board, boundaries excluded, None to compute only
+                the features listed in FEATURES (the other ones are NaN)
+
+        Returns
+        -------
+            2d numpy array of float, two 1d numpy arrays of int
+                A (K, F) matrix whose rows are the features of each resulting
+                board and placement, in the order of AFTER_FEATURES, the
+                number of lines cleared by each placement and its row. When
+                lines are cleared the board features depend on the content
+                of the removed rows and are meaningless (the placement
+                features are not). The row is -1 when the piece does not
+                fit in the board, see compute_landing_row
+    """
+    height = len(row_fills)
+    width = len(heights)
+    tops, bottoms, _, row_cells = piece.compute_profile_tables()
+    size = tops.shape[1]
+    offsets = np.arange(size)
+
+    states = np.asarray(states)
+    count = len(states)
+    top = tops[states]
+    inside = top >= 0
+
+    # The board is padded on the right and below the floor so that the
+    # bounding box of the piece always fits, cells out of the piece are
+    # ignored
+    padded = np.concatenate([heights, np.zeros(size, dtype=int)])
+    columns = np.asarray(columns)
+    covered = columns[:, None] + offsets
+    old_heights = padded[covered]
+
+    if rows is None:
+        landing = height - old_heights - bottoms[states] - 1
+        rows = np.where(inside, landing, height).min(axis=1)
+    rows = np.asarray(rows)
+    starts = np.maximum(rows, 0)
+
+    # Rows of the states above their bounding box, see compute_landing_row
+    offsets_top = np.array([
+        piece.compute_bounds(state)[0][0]
+        for state in range(piece.get_state_count())
+    ])
+    fits = rows >= offsets_top[states]
+
+    fills = np.concatenate([row_fills, np.zeros(size, dtype=int)])
+    cells = row_cells[states]
+    full = (fills[starts[:, None] + offsets] + cells == width) & (cells != 0)
+    cleared = np.count_nonzero(full, axis=1)
+
+    new_heights = np.where(
+        inside, np.maximum(old_heights, height - rows[:, None] - top),
+        old_heights
+    )
+
+    boards = np.empty((count, len(padded)), dtype=int)
+    boards[:] = padded
+    boards[np.arange(count)[:, None], covered] = new_heights
+    boards = boards[:, :width]
+
+    # Cells between the previous and the new height of a column, which are
+    # not filled by the piece, are new holes
+    new_holes = (new_heights - old_heights).sum(axis=1) - cells.sum(axis=1)
+
+    features = np.full((count, len(AFTER_FEATURES)), np.nan)
+    features[:, 0] = sum(holes) + new_holes
+    features[:, 1] = boards.max(axis=1)
+    features[:, 2] = boards.sum(axis=1)
+    features[:, 3] = np.abs(boards[:, 1:] - boards[:, :-1]).sum(axis=1)
+
+    if board is None:
+        return features, cleared, np.where(fits, rows, -1)
+
+    # Rows and columns covered by the piece, before and after the
+    # placement, boundaries and floor being filled. The grid is padded so
+    # that the bounding box always fits, padding is never changed
+    grid = np.zeros((height + 1 + size, width + 2 + size), dtype=bool)
+    grid[:height, 1:width + 1] = np.asarray(board) != 0
+    grid[:height, [0, width + 1]] = True
+    grid[height, 1:width + 1] = True
+
+    k = np.arange(count)[:, None, None]
+    piece_cells = piece.compute_cell_table()[states]
+    row_indices = starts[:, None, None] + offsets[:, None]
+    column_indices = columns[:, None, None] + 1 + offsets
+
+    old_rows = grid[row_indices[:, :, 0]]
+    new_rows = old_rows.copy()
+    new_rows[k, offsets[:, None], column_indices] |= piece_cells
+
+    old_columns = grid[:, column_indices[:, 0, :]].transpose(1, 0, 2)
+    new_columns = old_columns.copy()
+    new_columns[k, row_indices, offsets] |= piece_cells
+
+    # Changes of the transitions of the covered rows and columns
+    row_changes = np.count_nonzero(
+        new_rows[:, :, 1:width + 2] != new_rows[:, :, :width + 1],
+        axis=(1, 2)
+    ) - np.count_nonzero(
+        old_rows[:, :, 1:width + 2] != old_rows[:, :, :width + 1],
+        axis=(1, 2)
+    )
+    column_changes = np.count_nonzero(
+        new_columns[:, 1:height + 1] != new_columns[:, :height], axis=(1, 2)
+    ) - np.count_nonzero(
+        old_columns[:, 1:height + 1] != old_columns[:, :height], axis=(1, 2)
+    )
+
+    row_transitions = np.count_nonzero(
+        grid[:height, 1:width + 2] != grid[:height, :width + 1]
+    )
+    column_transitions = np.count_nonzero(
+        grid[1:height + 1, 1:width + 1] != grid[:height, 1:width + 1]
+    )
+
+    sides = np.full((count, width + 2), height)
+    sides[:, 1:-1] = boards
+    depths = np.maximum(np.minimum(sides[:, :-2], sides[:, 2:]) - boards, 0)
+
+    # Bounding boxes have no empty row
+    bottom_rows = rows + np.count_nonzero(cells, axis=1) - 1
+
+    features[:, 4] = row_transitions + row_changes
+    features[:, 5] = column_transitions + column_changes
+    features[:, 6] = (depths * (depths + 1) // 2).sum(axis=1)
+    features[:, 7] = (2 * height - rows - bottom_rows) / 2
+    features[:, 8] = cleared * (cells * full).sum(axis=1)
+
+    return features, cleared, np.where(fits, rows, -1)
+
+def compute_holes(board):
     """
-    max_height = 0
+        Compute the number of holes in the board
 
-    for j in range(0, board.shape[1]):
-        column_j = board[:, j]
+        Note: a hole is defined as an empty cell with a block one or more
+        blocks above
 
-        if np.count_nonzero(column_j) == 0:
-            min_index_j = 0
-        else: 
-            min_index_j = column_j.shape[0] - np.argmax(column_j)
+        Parameters
+        ----------
+            board: 2d array_like
+                The tetris board
+    """
+    heights = compute_column_heights(board)
+    return int(heights.sum()) - int(np.count_nonzero(board))
 
-        max_height = max(max_height, min_index_j)
+def compute_height(board):
+    """
+        Compute the maximum height of the board
 
-    return max_height
+        Parameters
+        ----------
+            board: 2d array_like
+                The tetris board
+    """
+    return int(compute_column_heights(board).max())
 
 def compute_bumpiness(board):
     """
         Compute bumpiness of a given board
 
-        The bumpiness measure how flat is the last layer of 
-        the board. 
+        The bumpiness measure how flat is the last layer of
+        the board.
 
         For two adjacent columns, the relative bumpiness is the absolute value
-        of the difference between the height of the columns. The total 
+        of the difference between the height of the columns. The total
         bumpiness is the sum of all relative bumpiness and is therefor a
         positive integer
 
@@ -67,18 +606,8 @@ def compute_bumpiness(board):
                 The tetris board filled with 1 (for a block) or 0
                 for empty space
     """
-    bumpiness = 0
-    
-    for j in range(0, board.shape[1] - 1):
-        col_j  = np.transpose(np.array([board[:, j]]))
-        col_jp = np.transpose(np.array([board[:, j + 1]]))
-
-        columnj_height  = compute_height(col_j)
-        columnjp_height = compute_height(col_jp)
-
-        bumpiness += abs(columnj_height - columnjp_height)
-
-    return bumpiness
+    heights = compute_column_heights(board)
+    return int(np.abs(np.diff(heights)).sum())
 
 def compute_sum_height(board):
     """
@@ -89,12 +618,4 @@ def compute_sum_height(board):
             board: 2d array_like
                 The tetris board
     """
-    sumH = 0
-
-    for j in range(0, board.shape[1]):
-        for i in range(0, board.shape[0]):
-            if board[i, j] == 1:
-                sumH += board.shape[0] - i
-                break
-
-    return sumH
\ No newline at end of file
+    return int(compute_column_heights(board).sum())
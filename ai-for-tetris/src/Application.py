@@ -24,9 +24,15 @@ class Application:
         Class holding the windows and setting up game
     """
 
-    def __init__(self):
+    def __init__(self, replay_path=None):
         """
             Ctor
+
+            Parameters
+            ----------
+                replay_path: str or None
+                    When given, the game is recorded and its replay is saved
+                    to this file when the application stops
         """
         mode = pygame.HWSURFACE | pygame.DOUBLEBUF
         self._main_window = pygame.display.set_mode((600, 800), mode)
@@ -57,11 +63,22 @@ class Application:
                 self._graphical_params, self._game_params
             )
         else:  
+            # Decisions take at most about one frame (60 fps) and are
+            # planned while the previous piece is displayed, for the AI
+            # that can plan on a copy of the game (played synchronously
+            # otherwise)
+            planner = getattr(AI, "plan", None)
             self._game = TetrisGraphicsBinder(
-                AI.predict, self._graphical_params, self._game_params
+                AI.predict, self._graphical_params, self._game_params,
+                deadline_ms=12 if planner is not None else None,
+                planner=planner
             )
             AI.bind(self._game)
 
+        self._replay_path = replay_path
+        if self._replay_path is not None:
+            self._game.start_recording()
+
     def run(self):
         """
             Run the application
@@ -83,6 +100,13 @@ class Application:
             self._update(events)
             self._draw()
 
+        # Stops the planning worker of the binder
+        if isinstance(self._game, TetrisGraphicsBinder):
+            self._game.close()
+
+        if self._replay_path is not None:
+            self._game.stop_recording().save(self._replay_path)
+
     def _update(self, events):
         """
             Update the application
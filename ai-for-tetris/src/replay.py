@@ -0,0 +1,145 @@
+import argparse
+import copy
+import sys
+import time
+
+import numpy as np
+
+from src.pieces import CLASSICAL_PIECES
+
+from src.tetris.base.Controls import Controls
+from src.tetris.base.Engines import ENGINES
+from src.tetris.base.Engines import create_game
+from src.tetris.base.GameParameters import GameParameters
+from src.tetris.base.Replay import Replay
+from src.tetris.base.Replay import compute_fingerprint
+
+
+def run_replay(replay, params):
+    """
+        Replays a game headless, as fast as possible
+
+        Parameters
+        ----------
+            replay: tetris.base.Replay.Replay
+                The replay
+            params: GameParameters
+                The parameters of the recorded game (the seed is taken from the
+                replay, the engine from the parameters)
+
+        Returns
+        -------
+            TetrisBase
+                The game after the last recorded action
+    """
+    fingerprint = compute_fingerprint(params)
+    unknown = bytes(8)
+
+    if unknown not in (fingerprint, replay.fingerprint) and \
+            fingerprint != replay.fingerprint:
+        raise ValueError("The replay was recorded with other parameters")
+
+    params = copy.copy(params)
+    params.seed = replay.seed
+    tetris = create_game(params)
+
+    controls = {c.value: c for c in Controls}
+
+    for event in replay.events:
+        if event[0] in controls:
+            mvt = controls[event[0]]
+
+            for _ in range(event[1]):
+                tetris.tick(mvt)
+        else:
+            tetris.place(event[1], event[2])
+
+    return tetris
+
+
+def verify_replay(replay, params):
+    """
+        Replays a game and checks that it ends exactly as recorded
+
+        Parameters
+        ----------
+            replay: tetris.base.Replay.Replay
+                The replay
+            params: GameParameters
+                The parameters of the recorded game
+
+        Returns
+        -------
+            bool
+                True iff the final board, score and number of lines all match
+    """
+    tetris = run_replay(replay, params)
+
+    return tetris._score == replay.score and \
+        tetris._lines_count == replay.lines and \
+        np.array_equal(tetris._board[:-1, 1:-1] != 0, replay.board)
+
+
+def parse_arguments(argv):
+    """
+        Parses the command line
+
+        Parameters
+        ----------
+            argv: list of str
+                The command line arguments (program name excluded)
+
+        Returns
+        -------
+            argparse.Namespace
+                The parsed arguments
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m src.replay",
+        description="Replays recorded games headless and checks that they "
+                    "end exactly as recorded."
+    )
+    parser.add_argument("replays", nargs="+",
+                        help="The replay files")
+    parser.add_argument("--engine", choices=sorted(ENGINES),
+                        default="bitboard", help="The board engine")
+
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """
+        Verifies the replays given on the command line
+
+        Parameters
+        ----------
+            argv: list of str or None
+                The command line arguments, default is sys.argv[1:]
+
+        Returns
+        -------
+            int
+                0 if every replay was verified, 1 otherwise
+    """
+    args = parse_arguments(sys.argv[1:] if argv is None else argv)
+    params = GameParameters(pieces=CLASSICAL_PIECES, engine=args.engine)
+
+    status = 0
+
+    for path in args.replays:
+        start = time.time()
+        replay = Replay.load(path)
+        verified = verify_replay(replay, params)
+
+        print(path, ": ", "verified" if verified else "MISMATCH",
+              ", lines : ", replay.lines, ", score : ", replay.score,
+              ", duration : ", round(time.time() - start, 3), "s", sep="")
+
+        if not verified:
+            status = 1
+
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
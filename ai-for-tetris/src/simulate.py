@@ -0,0 +1,247 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy as np
+
+from src.pieces import CLASSICAL_PIECES
+
+from src.AI.Random import RandomAI
+from src.AI.LookupAI import ALL_FEATURES
+from src.AI.LookupAI import DEFAULT_FEATURES
+from src.AI.LookupAI import LookupAI
+from src.AI.GeneticAlgorithm import GeneticAlgorithmParameters
+
+from src.tetris.base.Engines import ENGINES
+from src.tetris.base.Engines import create_game
+from src.tetris.base.GameParameters import GameParameters
+
+# Coefficients used by the application for LookupAI
+DEFAULT_COEFFS = [-0.5, 0.7, -0.35, -0.18]
+
+
+def play_game(task):
+    """
+        Plays a full headless game
+
+        Parameters
+        ----------
+            task: dict
+                The game to play, with keys :
+                    game: int
+                        The index of the game
+                    seed: int
+                        The seed of the game
+                    ai: str
+                        The name of the AI, "lookup" or "random"
+                    engine: str
+                        The board engine, see GameParameters
+                    max_pieces: int or None
+                        Stops the game after this number of pieces
+                    features: list of str
+                        The features weighted by LookupAI
+                    coeffs: list of float
+                        The coefficients of LookupAI, one per feature
+                    lookahead: bool
+                        Whether LookupAI also places the next piece
+                    top_k: int
+                        The number of moves LookupAI looks ahead from
+                    replay_dir: str or None
+                        The directory the replay of the game is saved to
+
+        Returns
+        -------
+            dict
+                The game index and seed, the number of lines, score and
+                pieces and the duration of the game in seconds
+    """
+    start = time.time()
+    params = GameParameters(
+        pieces=CLASSICAL_PIECES, seed=task["seed"], engine=task["engine"]
+    )
+    tetris = create_game(params)
+
+    if task["replay_dir"] is not None:
+        tetris.start_recording()
+
+    if task["ai"] == "lookup":
+        ai = LookupAI(
+            params, GeneticAlgorithmParameters(), features=task["features"],
+            lookahead=task["lookahead"], top_k=task["top_k"]
+        )
+        ai._coeffs = task["coeffs"]
+        ai.bind(tetris)
+    else:
+        ai = RandomAI(task["seed"])
+
+    max_pieces = task["max_pieces"]
+    pieces = 0
+
+    while not tetris._is_over and (max_pieces is None or pieces < max_pieces):
+        if task["ai"] == "lookup":
+            for m in ai.predict(None):
+                tetris.tick(m)
+        else:
+            # A piece is placed when the score changes
+            score = tetris._score
+            while score == tetris._score and not tetris._is_over:
+                tetris.tick(ai.predict(None))
+
+        pieces += 1
+
+    if task["replay_dir"] is not None:
+        path = os.path.join(
+            task["replay_dir"], "game_" + str(task["game"]) + ".replay"
+        )
+        tetris.stop_recording().save(path)
+
+    return {
+        "game": task["game"],
+        "seed": task["seed"],
+        "lines": tetris._lines_count,
+        "score": tetris._score,
+        "pieces": pieces,
+        "duration": time.time() - start
+    }
+
+
+def write_results(results, output):
+    """
+        Writes game results as they arrive, one JSON object per line
+
+        Parameters
+        ----------
+            results: iterable of dict
+                The results of play_game
+            output: file object
+                The file to write into
+
+        Returns
+        -------
+            list of int
+                The number of lines of each game
+    """
+    lines = []
+
+    for result in results:
+        lines.append(result["lines"])
+        output.write(json.dumps(result) + "\n")
+        output.flush()
+
+    return lines
+
+
+def parse_arguments(argv):
+    """
+        Parses the command line
+
+        Parameters
+        ----------
+            argv: list of str
+                The command line arguments (program name excluded)
+
+        Returns
+        -------
+            argparse.Namespace
+                The parsed arguments
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m src.simulate",
+        description="Plays headless Tetris games on a pool of processes "
+                    "and streams one JSON result per game."
+    )
+    parser.add_argument("--ai", choices=["lookup", "random"],
+                        default="lookup", help="The AI playing the games")
+    parser.add_argument("--games", type=int, default=100,
+                        help="The number of games to play")
+    parser.add_argument("--workers", type=int,
+                        default=multiprocessing.cpu_count(),
+                        help="The number of processes, default is one per "
+                             "core")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="The seed from which game seeds are drawn")
+    parser.add_argument("--max-pieces", type=int, default=None,
+                        help="Stops each game after this number of pieces")
+    parser.add_argument("--engine", choices=sorted(ENGINES),
+                        default="bitboard", help="The board engine")
+    parser.add_argument("--features", nargs="+", choices=ALL_FEATURES,
+                        default=list(DEFAULT_FEATURES), metavar="FEATURE",
+                        help="The features weighted by LookupAI, among " +
+                             ", ".join(ALL_FEATURES) + " (default is " +
+                             ", ".join(DEFAULT_FEATURES) + ")")
+    parser.add_argument("--coeffs", type=float, nargs="+",
+                        default=DEFAULT_COEFFS,
+                        help="The coefficients of LookupAI, one per feature")
+    parser.add_argument("--lookahead", action="store_true",
+                        help="LookupAI also places the next piece")
+    parser.add_argument("--top-k", type=int, default=4,
+                        help="The number of best moves LookupAI looks ahead "
+                             "from")
+    parser.add_argument("--output", default="-",
+                        help="The file results are written to (JSON lines), "
+                             "default is the standard output")
+    parser.add_argument("--replay-dir", default=None,
+                        help="Saves the replay of each game in this "
+                             "directory, see python -m src.replay")
+
+    args = parser.parse_args(argv)
+
+    if len(args.coeffs) != len(args.features):
+        parser.error("one coefficient per feature is required")
+
+    return args
+
+
+def main(argv=None):
+    """
+        Runs the simulation described by the command line
+
+        Parameters
+        ----------
+            argv: list of str or None
+                The command line arguments, default is sys.argv[1:]
+    """
+    args = parse_arguments(sys.argv[1:] if argv is None else argv)
+
+    seeds = np.random.RandomState(args.seed).randint(
+        0, 2 ** 31 - 1, size=args.games
+    )
+    tasks = [{
+        "game": i,
+        "seed": int(seeds[i]),
+        "ai": args.ai,
+        "engine": args.engine,
+        "max_pieces": args.max_pieces,
+        "features": list(args.features),
+        "coeffs": list(args.coeffs),
+        "lookahead": args.lookahead,
+        "top_k": args.top_k,
+        "replay_dir": args.replay_dir
+    } for i in range(args.games)]
+
+    if args.replay_dir is not None:
+        os.makedirs(args.replay_dir, exist_ok=True)
+
+    output = sys.stdout if args.output == "-" else open(args.output, "w")
+
+    try:
+        if args.workers <= 1:
+            lines = write_results(map(play_game, tasks), output)
+        else:
+            with multiprocessing.Pool(args.workers) as pool:
+                results = pool.imap_unordered(play_game, tasks)
+                lines = write_results(results, output)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    if len(lines) != 0:
+        print("Games : ", len(lines), ", mean lines : ", np.mean(lines),
+              file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
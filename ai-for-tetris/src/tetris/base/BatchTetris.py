@@ -0,0 +1,715 @@
+import numpy as np
+
+
+class BatchTetris:
+    """
+        Class that plays many Tetris games in lockstep
+
+        All boards are held in a single (N, H, W) array (boundaries excluded)
+        and each step places the current piece of every running game at once
+        with vectorized collision, placement and line clearing. Placements
+        follow TetrisBase.place : a game seeded with s and fed the same
+        placements ends with exactly the same board, score and line count as
+        TetrisBase with seed s.
+
+        Finished games (game over or max_pieces reached) have their results
+        stored, see pop_results. When auto_reset is set they are restarted
+        right away with a new seed so that the batch always stays full.
+    """
+    # Number of pieces drawn at once for each game
+    QUEUE_SIZE = 256
+
+    def __init__(self, params, count, seeds=None, max_pieces=None,
+                 auto_reset=True):
+        """
+            Ctor
+
+            Parameters
+            ----------
+                params: GameParameters
+                    The parameters shared by all games
+                count: int
+                    The number of games played simultaneously
+                seeds: array_like of int or int or None
+                    Either the seed of each game (count seeds) or the seed of
+                    the generator that draws game seeds. Default is None
+                max_pieces: int or None
+                    When set, a game is over once this number of pieces has
+                    been placed
+                auto_reset: bool
+                    When true, finished games are restarted with a new seed
+        """
+        self._params = params
+        self._count = count
+        self._max_pieces = max_pieces
+        self._auto_reset = auto_reset
+
+        size = params.board_size
+        self._boards = np.zeros((count, size[0], size[1]), dtype=np.int8)
+        self._heights = np.zeros((count, size[1]), dtype=np.int64)
+
+        self._build_tables(params.pieces)
+
+        if seeds is None or np.isscalar(seeds):
+            self._seeder = np.random.RandomState(seeds)
+            seeds = self._seeder.randint(0, 2 ** 31 - 1, size=count)
+        else:
+            self._seeder = np.random.RandomState(int(seeds[0]))
+            assert (len(seeds) == count)
+
+        self._seeds = np.asarray(seeds, dtype=np.int64)
+        self._randoms = [np.random.RandomState(int(s)) for s in self._seeds]
+
+        # Upcoming pieces of each game, drawn in bulk from its generator (the
+        # sequence is the same as drawing them one by one like TetrisBase)
+        self._queue = np.zeros((count, BatchTetris.QUEUE_SIZE), dtype=np.int64)
+        self._queue_pos = np.zeros(count, dtype=np.int64)
+
+        for g in range(count):
+            self._fill_queue(g)
+
+        self._current = np.zeros(count, dtype=np.int64)
+        self._next = np.zeros(count, dtype=np.int64)
+
+        self._is_over = np.zeros(count, dtype=bool)
+        self._level = np.zeros(count, dtype=np.int64)
+        self._score = np.zeros(count, dtype=np.int64)
+        self._lines_count = np.zeros(count, dtype=np.int64)
+        self._pieces_count = np.zeros(count, dtype=np.int64)
+        self._speed = np.full(count, params.initial_speed, dtype=np.int64)
+
+        self._results = []
+
+        # Named policies can score all games at once, see Policy
+        policies = (
+            params.speed_update_policy,
+            params.line_scoring_policy,
+            params.piece_scoring_policy,
+            params.next_level_policy
+        )
+        self._vectorized = all(
+            getattr(policy, "vectorized", False) for policy in policies
+        )
+
+        # Same drawing order as TetrisBase : next piece then current piece
+        all_games = np.arange(count)
+        self._draw_new_pieces(all_games)
+        self._draw_new_pieces(all_games)
+
+    def _build_tables(self, pieces):
+        """
+            Builds the vectorized piece tables
+
+            Every table is indexed by (piece, state). States are padded to the
+            largest state count by wrapping around, cells are padded by
+            repeating the first cell (writing it twice is harmless) and the
+            bottom profile is padded with a value that never limits a drop.
+
+            Parameters
+            ----------
+                pieces: list of src.tetris.base.Piece
+                    The pieces of the game
+        """
+        size = self._params.board_size
+        piece_count = len(pieces)
+        states = max(p.get_state_count() for p in pieces)
+
+        cells = []
+        for piece in pieces:
+            for state in range(piece.get_state_count()):
+                _, bounded = piece.compute_bounds(state)
+                cells.append(np.count_nonzero(bounded))
+
+        cell_count = max(cells)
+        width = max(
+            p.compute_bounds(s)[0][3] - p.compute_bounds(s)[0][2] + 1
+            for p in pieces for s in range(p.get_state_count())
+        )
+
+        shape = (piece_count, states)
+        self._state_counts = np.array([p.get_state_count() for p in pieces])
+        self._tops = np.zeros(shape, dtype=np.int64)
+        self._lefts = np.zeros(shape, dtype=np.int64)
+        self._widths = np.zeros(shape, dtype=np.int64)
+        self._cell_rows = np.zeros(shape + (cell_count,), dtype=np.int64)
+        self._cell_cols = np.zeros(shape + (cell_count,), dtype=np.int64)
+        self._cell_counts = np.zeros(shape, dtype=np.int64)
+        self._profiles = np.full(shape + (width,), -4 * size[0],
+                                 dtype=np.int64)
+
+        # Spawn position of each piece (see TetrisBase._draw_new_piece)
+        self._spawn_states = np.zeros(piece_count, dtype=np.int64)
+        self._spawn_cols = np.zeros(piece_count, dtype=np.int64)
+
+        for p, piece in enumerate(pieces):
+            spawn_state = piece.get_state_index()
+            shape_x = piece.get_current_state().shape[1]
+
+            self._spawn_states[p] = spawn_state
+            self._spawn_cols[p] = int((size[1] - shape_x) / 2)
+
+            for s in range(states):
+                state = s % piece.get_state_count()
+                indices, bounded = piece.compute_bounds(state)
+                _, profile = piece.compute_bottom_profile(state)
+
+                rows, cols = np.nonzero(bounded)
+                pad = cell_count - rows.shape[0]
+                rows = np.concatenate((rows, np.repeat(rows[:1], pad)))
+                cols = np.concatenate((cols, np.repeat(cols[:1], pad)))
+
+                self._tops[p, s] = indices[0]
+                self._lefts[p, s] = indices[2]
+                self._widths[p, s] = indices[3] - indices[2] + 1
+                self._cell_rows[p, s] = rows
+                self._cell_cols[p, s] = cols
+                self._cell_counts[p, s] = cols.shape[0] - pad
+                self._profiles[p, s, :profile.shape[0]] = np.where(
+                    profile >= 0, profile, -4 * size[0]
+                )
+
+        # Hard drops of each piece, in the order of TetrisBase.enumerate_drops
+        # and padded by repeating the first one, see enumerate_drops
+        drops = [
+            [
+                (state, column)
+                for state in piece.get_distinct_states()
+                for column in range(size[1] - self._widths[p, state] + 1)
+            ]
+            for p, piece in enumerate(pieces)
+        ]
+
+        drop_count = max(len(d) for d in drops)
+        self._drop_states = np.zeros((piece_count, drop_count), dtype=np.int64)
+        self._drop_columns = np.zeros((piece_count, drop_count),
+                                      dtype=np.int64)
+        self._drop_valid = np.zeros((piece_count, drop_count), dtype=bool)
+
+        for p, piece_drops in enumerate(drops):
+            padded = piece_drops + piece_drops[:1] * \
+                (drop_count - len(piece_drops))
+            self._drop_states[p], self._drop_columns[p] = np.transpose(padded)
+            self._drop_valid[p, :len(piece_drops)] = True
+
+    def _fill_queue(self, game):
+        """
+            Draws the next upcoming pieces of a game
+
+            Parameters
+            ----------
+                game: int
+                    The index of the game
+        """
+        self._queue[game] = self._randoms[game].randint(
+            0, len(self._params.pieces), size=BatchTetris.QUEUE_SIZE
+        )
+        self._queue_pos[game] = 0
+
+    def _draw_new_pieces(self, games):
+        """
+            Draws a new piece for the given games
+
+            The current piece becomes the next one which is (randomly) drawn
+            from the game own random number generator. Games whose new
+            current piece cannot spawn are over.
+
+            Parameters
+            ----------
+                games: 1D array of int
+                    The indices of the games
+        """
+        for g in games[self._queue_pos[games] == BatchTetris.QUEUE_SIZE]:
+            self._fill_queue(g)
+
+        self._current[games] = self._next[games]
+        self._next[games] = self._queue[games, self._queue_pos[games]]
+        self._queue_pos[games] += 1
+
+        pieces = self._current[games]
+        states = self._spawn_states[pieces]
+
+        lefts = self._spawn_cols[pieces] + self._lefts[pieces, states]
+        rows = self._tops[pieces, states][:, None] + \
+            self._cell_rows[pieces, states]
+        cols = lefts[:, None] + self._cell_cols[pieces, states]
+
+        blocked = self._boards[games[:, None], rows, cols].any(axis=1)
+        self._is_over[games[blocked]] = True
+
+    def place(self, rotations, columns):
+        """
+            Places the current piece of every running game
+
+            See TetrisBase.place for the meaning of a placement. Finished
+            games ignore their placement.
+
+            Parameters
+            ----------
+                rotations: 1D array_like of int
+                    The state of the piece to place, for each game
+                columns: 1D array_like of int
+                    The board column of the left side of the piece bounding
+                    box, for each game
+
+            Returns
+            -------
+                1D numpy array of int
+                    The number of line removed in each game
+        """
+        size = self._params.board_size
+        rotations = np.asarray(rotations, dtype=np.int64)
+        columns = np.asarray(columns, dtype=np.int64)
+        lines = np.zeros(self._count, dtype=np.int64)
+
+        games = np.flatnonzero(~self._is_over)
+        if games.shape[0] == 0:
+            return lines
+
+        pieces = self._current[games]
+        states = rotations[games]
+        cols = columns[games]
+
+        if np.any((states < 0) | (states >= self._state_counts[pieces])):
+            raise ValueError("Undefined rotation")
+
+        rights = cols + self._widths[pieces, states]
+        if np.any((cols < 0) | (rights > size[1])):
+            raise ValueError("Column out of the board")
+
+        # Landing row of the top of the bounding box, see TetrisBase.place
+        profiles = self._profiles[pieces, states]
+        covered = np.minimum(
+            cols[:, None] + np.arange(profiles.shape[1]), size[1] - 1
+        )
+        surface = size[0] - self._heights[games[:, None], covered]
+        landing = np.min(surface - profiles - 1, axis=1)
+
+        tops = self._tops[pieces, states]
+        blocked = landing - tops < 0
+        self._is_over[games[blocked]] = True
+        self._collect_finished(games[blocked])
+
+        games, pieces, states = games[~blocked], pieces[~blocked], \
+            states[~blocked]
+        cols, landing, tops = cols[~blocked], landing[~blocked], \
+            tops[~blocked]
+
+        if games.shape[0] == 0:
+            return lines
+
+        # Write the cells and raise the covered columns
+        rows = landing[:, None] + self._cell_rows[pieces, states]
+        cells = cols[:, None] + self._cell_cols[pieces, states]
+        self._boards[games[:, None], rows, cells] = 1
+        np.maximum.at(
+            self._heights, (games[:, None], cells), size[0] - rows
+        )
+
+        lines[games] = self._process_lines(games)
+
+        # Scoring, same policies as TetrisBase
+        positions_x = cols + 1 - self._lefts[pieces, states]
+        positions_y = landing - tops
+
+        if self._vectorized:
+            self._score_games(games, (positions_x, positions_y), lines[games])
+        else:
+            self._score_games_one_by_one(
+                games, (positions_x, positions_y), lines[games]
+            )
+
+        self._pieces_count[games] += 1
+        self._draw_new_pieces(games)
+
+        if self._max_pieces is not None:
+            self._is_over[self._pieces_count >= self._max_pieces] = True
+
+        self._collect_finished(games)
+
+        return lines
+
+    def enumerate_drops(self, games):
+        """
+            Lists the hard drops of the current piece of the given games
+
+            Drops are listed as TetrisBase.enumerate_drops does. Since pieces
+            have different numbers of drops, the lists are padded with the
+            first drop of the piece, marked as invalid.
+
+            Parameters
+            ----------
+                games: 1D array of int
+                    The indices of the games
+
+            Returns
+            -------
+                tuple of three 2D numpy arrays
+                    The (K, C) states and columns of the drops (see place) and
+                    whether each drop is valid (not padding)
+        """
+        pieces = self._current[games]
+
+        return (
+            self._drop_states[pieces],
+            self._drop_columns[pieces],
+            self._drop_valid[pieces]
+        )
+
+    def try_drops(self, games, rotations, columns):
+        """
+            Computes the boards the given placements lead to, without playing
+            them
+
+            Each game gets C candidate placements of its current piece, see
+            place and enumerate_drops.
+
+            Parameters
+            ----------
+                games: 1D array of int
+                    The indices of the games
+                rotations: 2D array_like of int
+                    The (K, C) states of the piece to place
+                columns: 2D array_like of int
+                    The (K, C) board columns of the left side of the piece
+                    bounding box
+
+            Returns
+            -------
+                tuple of a 4D and four 2D numpy arrays
+                    The (K, C, H, W) boards after each placement once its
+                    completed lines are removed, the (K, C) number of lines
+                    removed, whether the piece fits (otherwise the
+                    placement ends the game and its board is meaningless),
+                    the height of the middle of the piece from the floor
+                    and the number of cells of the piece in the removed
+                    lines
+        """
+        size = self._params.board_size
+        rotations = np.asarray(rotations, dtype=np.int64)
+        columns = np.asarray(columns, dtype=np.int64)
+        shape = rotations.shape
+
+        # One row per candidate, see place
+        candidates = np.repeat(games, shape[1])
+        pieces = self._current[candidates]
+        states = rotations.ravel()
+        cols = columns.ravel()
+
+        profiles = self._profiles[pieces, states]
+        covered = np.minimum(
+            cols[:, None] + np.arange(profiles.shape[1]), size[1] - 1
+        )
+        surface = size[0] - self._heights[candidates[:, None], covered]
+        landing = np.min(surface - profiles - 1, axis=1)
+
+        fits = landing - self._tops[pieces, states] >= 0
+
+        # Placements that do not fit are written clamped to the board
+        rows = landing[:, None] + self._cell_rows[pieces, states]
+        middles = size[0] - (rows.min(axis=1) + rows.max(axis=1)) / 2
+        rows = np.maximum(rows, 0)
+        cells = cols[:, None] + self._cell_cols[pieces, states]
+
+        boards = self._boards[candidates]
+        indices = np.arange(candidates.shape[0])[:, None]
+        boards[indices, rows, cells] = 1
+
+        # Padding cells repeat the first one, they are not counted twice
+        padding = np.arange(rows.shape[1]) >= \
+            self._cell_counts[pieces, states][:, None]
+        full = boards[indices, rows].all(axis=2) & ~padding
+        lines = self._remove_full_rows(boards)
+
+        return (
+            boards.reshape(shape + boards.shape[1:]),
+            lines.reshape(shape),
+            fits.reshape(shape),
+            middles.reshape(shape),
+            np.count_nonzero(full, axis=1).reshape(shape)
+        )
+
+    def _score_games(self, games, positions, lines):
+        """
+            Updates score, lines and level of the given games at once
+
+            Only valid when every policy is vectorized.
+
+            Parameters
+            ----------
+                games: 1D array of int
+                    The indices of the games
+                positions: tuple of two 1D array of int
+                    The position of the placed piece of each game
+                lines: 1D array of int
+                    The number of lines removed in each game
+        """
+        params = self._params
+        levels = self._level[games]
+
+        self._lines_count[games] += lines
+        self._score[games] += params.piece_scoring_policy(positions, levels)
+        self._score[games] += params.line_scoring_policy(lines, levels)
+
+        next_level = np.asarray(
+            params.next_level_policy(levels, self._lines_count[games]),
+            dtype=bool
+        )
+        leveled = games[next_level]
+
+        self._speed[leveled] = params.speed_update_policy(self._speed[leveled])
+        self._level[leveled] += 1
+
+    def _score_games_one_by_one(self, games, positions, lines):
+        """
+            Updates score, lines and level of the given games one by one
+
+            Parameters
+            ----------
+                games: 1D array of int
+                    The indices of the games
+                positions: tuple of two 1D array of int
+                    The position of the placed piece of each game
+                lines: 1D array of int
+                    The number of lines removed in each game
+        """
+        params = self._params
+
+        for k, g in enumerate(games):
+            level = self._level[g]
+            self._lines_count[g] += lines[k]
+            self._score[g] += params.piece_scoring_policy(
+                (positions[0][k], positions[1][k]), level
+            )
+            self._score[g] += params.line_scoring_policy(lines[k], level)
+
+            if params.next_level_policy(level, self._lines_count[g]):
+                self._speed[g] = params.speed_update_policy(self._speed[g])
+                self._level[g] += 1
+
+    def _process_lines(self, games):
+        """
+            Removes the completed lines of the given games
+
+            Parameters
+            ----------
+                games: 1D array of int
+                    The indices of the games
+
+            Returns
+            -------
+                1D numpy array of int
+                    The number of line removed in each of the games
+        """
+        boards = self._boards[games]
+        lines = self._remove_full_rows(boards)
+
+        cleared = lines != 0
+        if not cleared.any():
+            return lines
+
+        self._boards[games[cleared]] = boards[cleared]
+        self._heights[games[cleared]] = self._compute_heights(boards[cleared])
+
+        return lines
+
+    def _remove_full_rows(self, boards):
+        """
+            Removes the full rows of a stack of boards
+
+            Parameters
+            ----------
+                boards: 3D numpy array
+                    The boards (without boundaries), modified in place
+
+            Returns
+            -------
+                1D numpy array of int
+                    The number of rows removed from each board
+        """
+        full = boards.all(axis=2)
+        lines = full.sum(axis=1)
+
+        cleared = lines != 0
+        if not cleared.any():
+            return lines
+
+        # Stable sort moves full rows to the top, keeping the others in order
+        order = np.argsort(~full[cleared], axis=1, kind="stable")
+        kept = np.take_along_axis(boards[cleared], order[:, :, None], axis=1)
+
+        height = boards.shape[1]
+        kept[np.arange(height)[None, :] < lines[cleared][:, None]] = 0
+
+        boards[cleared] = kept
+
+        return lines
+
+    def _compute_heights(self, boards):
+        """
+            Computes column heights of a stack of boards
+
+            Parameters
+            ----------
+                boards: 3D numpy array
+                    The boards (without boundaries)
+
+            Returns
+            -------
+                2D numpy array of int
+                    The height of each column of each board
+        """
+        filled = boards != 0
+        tops = np.argmax(filled, axis=1)
+
+        return np.where(filled.any(axis=1), boards.shape[1] - tops, 0)
+
+    def _collect_finished(self, games):
+        """
+            Stores the results of the finished games among games
+
+            Finished games are restarted when auto_reset is set.
+
+            Parameters
+            ----------
+                games: 1D array of int
+                    The indices of the games that just played
+        """
+        finished = games[self._is_over[games]]
+
+        for g in finished:
+            self._results.append({
+                "seed": int(self._seeds[g]),
+                "lines": int(self._lines_count[g]),
+                "score": int(self._score[g]),
+                "pieces": int(self._pieces_count[g])
+            })
+
+        if self._auto_reset and finished.shape[0] != 0:
+            self.reset(finished)
+
+    def reset(self, games, seeds=None):
+        """
+            Restarts some games
+
+            Parameters
+            ----------
+                games: 1D array_like of int
+                    The indices of the games to restart
+                seeds: 1D array_like of int or None
+                    The new seeds of the games, drawn from the seed generator
+                    by default
+        """
+        games = np.asarray(games, dtype=np.int64)
+
+        if seeds is None:
+            seeds = self._seeder.randint(0, 2 ** 31 - 1, size=games.shape[0])
+
+        for g, seed in zip(games, seeds):
+            self._seeds[g] = seed
+            # Reseeding is much faster than building a new generator
+            self._randoms[g].seed(int(seed))
+            self._fill_queue(g)
+
+        self._boards[games] = 0
+        self._heights[games] = 0
+        self._is_over[games] = False
+        self._level[games] = 0
+        self._score[games] = 0
+        self._lines_count[games] = 0
+        self._pieces_count[games] = 0
+        self._speed[games] = self._params.initial_speed
+
+        self._draw_new_pieces(games)
+        self._draw_new_pieces(games)
+
+    def pop_results(self):
+        """
+            Returns and forgets the results of the finished games
+
+            Returns
+            -------
+                list of dict
+                    For each game finished since the last call : its seed and
+                    its final number of lines, score and number of pieces
+        """
+        results = self._results
+        self._results = []
+
+        return results
+
+    def get_boards(self):
+        """
+            Returns the boards of all games
+
+            Returns
+            -------
+                3D numpy array
+                    The (N, H, W) boards, boundaries excluded. Must not be
+                    modified
+        """
+        return self._boards
+
+    def get_column_heights(self):
+        """
+            Returns the column heights of all games
+
+            Returns
+            -------
+                2D numpy array of int
+                    The (N, W) column heights. Must not be modified
+        """
+        return self._heights
+
+    def get_current_pieces(self):
+        """
+            Returns the index (in GameParameters.pieces) of the current piece
+            of all games
+
+            Returns
+            -------
+                1D numpy array of int
+                    The current piece of each game
+        """
+        return self._current
+
+    def get_next_pieces(self):
+        """
+            Returns the index (in GameParameters.pieces) of the next piece of
+            all games
+
+            Returns
+            -------
+                1D numpy array of int
+                    The next piece of each game
+        """
+        return self._next
+
+    def is_over(self):
+        """
+            Returns which games are over
+
+            Only meaningful without auto_reset since finished games are
+            restarted right away otherwise.
+
+            Returns
+            -------
+                1D numpy array of bool
+                    True for each finished game
+        """
+        return self._is_over
+
+    def get_stats(self):
+        """
+            Returns the counters of all games
+
+            Returns
+            -------
+                dict of 1D numpy array
+                    The score, lines, level and pieces counters of each game
+        """
+        return {
+            "score": self._score,
+            "lines": self._lines_count,
+            "level": self._level,
+            "pieces": self._pieces_count
+        }
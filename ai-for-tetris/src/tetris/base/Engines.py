@@ -0,0 +1,28 @@
+from src.tetris.base.TetrisBase import TetrisBase
+from src.tetris.base.TetrisBitboard import TetrisBitboard
+
+# Available board engines, see GameParameters.engine
+ENGINES = {
+    "numpy": TetrisBase,
+    "bitboard": TetrisBitboard
+}
+
+
+def create_game(params):
+    """
+        Creates a headless game using the engine named in the parameters
+
+        Parameters
+        ----------
+            params: GameParameters
+                Parameters for the game
+
+        Returns
+        -------
+            TetrisBase
+                A new game, whose class depends on params.engine
+    """
+    if params.engine not in ENGINES:
+        raise NameError("Undefined engine " + str(params.engine))
+
+    return ENGINES[params.engine](params)
@@ -1,7 +1,20 @@
+from src.tetris.base.Policies import get_policy
+from src.tetris.base.Policies import ConstantSpeed
+from src.tetris.base.Policies import EveryNLines
+from src.tetris.base.Policies import PositionPieceScoring
+from src.tetris.base.Policies import QuadraticLineScoring
+
+
 class GameParameters:
     """
         Data class holding all game parameters
 
+        Policies can be any function, but the default ones are named policies
+        (see src.tetris.base.Policies) which can also be given by name or by
+        a (name, arguments) tuple. Parameters only holding named policies can
+        be pickled (hence sent to other processes) and have a signature
+        usable as a cache key.
+
         Supported parameters are :
             board_size: two int tuple
                 The size of the board
@@ -29,6 +42,13 @@ class GameParameters:
                 piece was placed (tuple of two int), as a second argument the
                 current level of the game (int) and returns the corresponding
                 score (int)
+            next_level_policy: function
+                Function telling whether the next level is reached. The
+                function takes as a first argument the current level (int), as
+                a second argument the number of lines (int) and returns a bool
+            engine: str
+                The name of the board engine used by create_game, either
+                "numpy" (reference implementation) or "bitboard"
     """
 
     def __init__(self, **kwargs):
@@ -65,21 +85,90 @@ class GameParameters:
                         position at which the piece was placed (tuple of
                         two int), as a second argument the current level of the
                         game (int) and returns the corresponding score (int)
+                    next_level_policy: function
+                        Function telling whether the next level is reached.
+                        The function takes as a first argument the current
+                        level (int), as a second argument the number of lines
+                        (int) and returns a bool
+                    engine: str
+                        The name of the board engine used by create_game,
+                        either "numpy" (reference implementation) or
+                        "bitboard"
         """
         self.board_size = kwargs.get("board_size", (20, 10))
         self.pieces = kwargs.get("pieces", [])
         self.seed = kwargs.get("seed", None)
-        self.line_score = kwargs.get("line_score", 50)
         self.initial_speed = kwargs.get("initial_speed", 35)
-        self.speed_update_policy = kwargs.get(
-            "speed_update_policy", lambda speed: speed
-        )
-        self.line_scoring_policy = kwargs.get(
-            "line_scoring", lambda ln, ll: self.line_score * ln ** 2 * (1 + ll)
-        )
-        self.piece_scoring_policy = kwargs.get(
-            "piece_scoring_policy", lambda pos, lvl: (pos[0] + lvl + 1) ** 2
+        self.speed_update_policy = get_policy(kwargs.get(
+            "speed_update_policy", ConstantSpeed()
+        ))
+        self.line_scoring_policy = get_policy(kwargs.get(
+            "line_scoring_policy", kwargs.get("line_scoring", None)
+        ))
+        # Default line scoring policy, following line_score (see line_score)
+        self._default_line_scoring = None
+        self.line_score = kwargs.get("line_score", 50)
+        self.piece_scoring_policy = get_policy(kwargs.get(
+            "piece_scoring_policy", PositionPieceScoring()
+        ))
+        self.next_level_policy = get_policy(kwargs.get(
+            "next_level_policy", EveryNLines(40)
+        ))
+        self.engine = kwargs.get("engine", "numpy")
+
+    @property
+    def line_score(self):
+        """
+            Score acquired for completing a single line in the first level
+        """
+        return self._line_score
+
+    @line_score.setter
+    def line_score(self, line_score):
+        """
+            Sets the score of a single line
+
+            Unless another line scoring policy was given, the line scoring
+            policy is the default one built from line_score, hence changing
+            line_score changes the score of the following lines.
+        """
+        self._line_score = line_score
+
+        if self.line_scoring_policy is None or \
+                self.line_scoring_policy is self._default_line_scoring:
+            self._default_line_scoring = QuadraticLineScoring(line_score)
+            self.line_scoring_policy = self._default_line_scoring
+
+    def get_signature(self):
+        """
+            Returns a hashable description of the parameters
+
+            Two parameters with the same signature play the exact same games.
+            Only parameters whose policies are named policies have a
+            signature.
+
+            Returns
+            -------
+                tuple
+                    The signature of the parameters
+        """
+        policies = (
+            self.speed_update_policy,
+            self.line_scoring_policy,
+            self.piece_scoring_policy,
+            self.next_level_policy
         )
-        self.next_level_policy = kwargs.get(
-            "next_level_policy", lambda lvl, lns: lns % 40 == 0 and lns != 0
+
+        for policy in policies:
+            if not hasattr(policy, "get_signature"):
+                raise TypeError("Policy " + repr(policy) + " is not named")
+
+        return (
+            tuple(self.board_size),
+            tuple(piece.get_signature() for piece in self.pieces),
+            self.seed,
+            self.line_score,
+            self.initial_speed,
+            tuple(policy.get_signature() for policy in policies),
+            self.engine
         )
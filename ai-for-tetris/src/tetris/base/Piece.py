@@ -8,6 +8,12 @@ class Piece:
         A 'piece' is a collection of two dimensional array. The rotation is
         emulated by changing an index within that array. This construction
         allows very flexible mechanics.
+
+        Everything the game needs to know about a state (bounding box, bounded
+        array, row masks, bottom profile and cell counts) is computed once
+        when the piece is built, so that all lookups are simple table reads.
+        Those tables are never modified and are shared between copies of the
+        piece.
     """
 
     def __init__(self, *states):
@@ -23,10 +29,261 @@ class Piece:
         self._states = []
 
         for state_data in states:
-            self._states.append(np.asarray(state_data))
+            state = np.array(state_data)
+            state.setflags(write=False)
+            self._states.append(state)
+
+        # Per state tables, see _compute_tables
+        self._bounds = []
+        self._bounded = []
+        self._masks = []
+        self._bottoms = []
+        self._cell_counts = []
+
+        for state in self._states:
+            self._compute_tables(state)
+
+        self._compute_symmetries()
+        self._compute_profile_tables()
+
+        # Packed masks of every state, by stride, see compute_packed_masks.
+        # Filled on demand and shared with the copies of the piece
+        self._packed_masks = {}
+
+        # Hashable description of the states, see get_signature
+        self._signature = tuple(
+            (state.shape, (state != 0).tobytes()) for state in self._states
+        )
 
         self._current_state = 0
 
+    def _compute_tables(self, array):
+        """
+            Computes and stores the tables of a state
+
+            Parameters
+            ----------
+                array: 2D numpy array
+                    The state data
+        """
+        filled = array != 0
+        rows = np.flatnonzero(filled.any(axis=1))
+        columns = np.flatnonzero(filled.any(axis=0))
+
+        k, l = int(rows[0]), int(rows[-1])
+        i, j = int(columns[0]), int(columns[-1])
+
+        bounded = array[k:(l + 1), i:(j + 1)]
+        bounded_filled = bounded != 0
+
+        # Bit c of the r-th mask is set iff the element (r, c) is non zero
+        weights = 1 << np.arange(bounded.shape[1])
+        masks = tuple(int(m) for m in bounded_filled.dot(weights))
+
+        # Index of the lowest non zero element of each column, -1 if none
+        last = bounded.shape[0] - 1
+        bottoms = last - np.argmax(bounded_filled[::-1, :], axis=0)
+        bottoms[~bounded_filled.any(axis=0)] = -1
+        bottoms.setflags(write=False)
+
+        # Index of the highest non zero element of each column, -1 if none,
+        # and number of non zero elements of each column and of each row
+        tops = np.argmax(bounded_filled, axis=0)
+        tops[~bounded_filled.any(axis=0)] = -1
+        cell_counts = (
+            tuple(int(t) for t in tops),
+            tuple(int(c) for c in bounded_filled.sum(axis=0)),
+            tuple(int(c) for c in bounded_filled.sum(axis=1))
+        )
+
+        self._bounds.append((k, l, i, j))
+        self._bounded.append(bounded)
+        self._masks.append(masks)
+        self._bottoms.append(bottoms)
+        self._cell_counts.append(cell_counts)
+
+    def _compute_symmetries(self):
+        """
+            Computes the duplicate states of the piece
+
+            Two states are duplicates when their bounded arrays are equal :
+            they fill the same cells once placed. The rotation period is the
+            smallest number of rotations giving back the exact same state
+            arrays, states one period apart are interchangeable.
+        """
+        count = len(self._states)
+        keys = [(b.shape, (b != 0).tobytes()) for b in self._bounded]
+
+        self._canonical_states = tuple(keys.index(key) for key in keys)
+        self._distinct_states = tuple(
+            s for s in range(count) if self._canonical_states[s] == s
+        )
+
+        self._rotation_period = next(
+            p for p in range(1, count + 1) if count % p == 0 and all(
+                np.array_equal(self._states[s], self._states[(s + p) % count])
+                for s in range(count)
+            )
+        )
+
+    def _compute_profile_tables(self):
+        """
+            Stacks the profiles and cell counts of all the states
+
+            Each state is padded to the size of the largest bounded array, so
+            that placements in any state can be processed at once, see
+            compute_profile_tables.
+        """
+        count = len(self._states)
+        size = max(max(b.shape) for b in self._bounded)
+
+        tops = np.full((count, size), -1)
+        bottoms = np.full((count, size), -1)
+        column_cells = np.zeros((count, size), dtype=int)
+        row_cells = np.zeros((count, size), dtype=int)
+
+        for s in range(count):
+            top, column_count, row_count = self._cell_counts[s]
+
+            tops[s, :len(top)] = top
+            bottoms[s, :len(self._bottoms[s])] = self._bottoms[s]
+            column_cells[s, :len(column_count)] = column_count
+            row_cells[s, :len(row_count)] = row_count
+
+        self._profile_tables = (tops, bottoms, column_cells, row_cells)
+
+        # Cells of each bounded matrix, padded with empty cells
+        self._cell_table = np.zeros((count, size, size), dtype=bool)
+        for s, bounded in enumerate(self._bounded):
+            self._cell_table[s, :bounded.shape[0], :bounded.shape[1]] = \
+                bounded != 0
+
+        for table in self._profile_tables + (self._cell_table, ):
+            table.setflags(write=False)
+
+    def get_copy(self):
+        """
+            Returns a copy of the piece
+
+            Only the current state is copied, the states and their tables are
+            shared with the copy since they are never modified.
+
+            Returns
+            -------
+                Piece
+                    A copy of the piece
+        """
+        piece = Piece.__new__(Piece)
+        piece.__dict__.update(self.__dict__)
+
+        return piece
+
+    def __deepcopy__(self, memo):
+        """
+            Deepcopy support, see get_copy
+        """
+        return self.get_copy()
+
+    def get_signature(self):
+        """
+            Returns a hashable description of the piece states
+
+            Returns
+            -------
+                tuple
+                    The shape and data of each state
+        """
+        return self._signature
+
+    def get_state_count(self):
+        """
+            Returns the number of states of the piece
+
+            Returns
+            -------
+                int
+                    The number of states
+        """
+        return len(self._states)
+
+    def get_canonical_state(self, state=None):
+        """
+            Returns the first state filling the same cells as a state
+
+            Parameters
+            ----------
+                state: int or None
+                    The index of the state, default is the current state
+
+            Returns
+            -------
+                int
+                    The index of the first state whose bounded array is equal
+                    to the one of the state
+        """
+        if state is None:
+            state = self._current_state
+
+        return self._canonical_states[state]
+
+    def get_distinct_states(self):
+        """
+            Returns the states filling distinct cells
+
+            Dropping a piece in each of these states (see TetrisBase.place)
+            covers every placement a drop can lead to.
+
+            Returns
+            -------
+                tuple of int
+                    The index of the first state of each group of duplicates
+        """
+        return self._distinct_states
+
+    def get_rotation_period(self):
+        """
+            Returns the rotation period of the piece
+
+            States s and s + period are identical, and so are all the states
+            reached from them by the same rotations, hence a search on
+            rotations can consider states modulo the period.
+
+            Returns
+            -------
+                int
+                    The smallest number of rotations giving back the same
+                    states, 1 for a piece whose states are all identical
+        """
+        return self._rotation_period
+
+    def get_state_index(self, direction=0):
+        """
+            Returns the index of the state reached by a rotation
+
+            Parameters
+            ----------
+                direction: int
+                    The direction and magnitude of the rotation, see rotate.
+                    Default is 0, the current state
+
+            Returns
+            -------
+                int
+                    The index of the state
+        """
+        return (self._current_state + direction) % len(self._states)
+
+    def set_state_index(self, state):
+        """
+            Sets the current state of the piece
+
+            Parameters
+            ----------
+                state: int
+                    The index of the state
+        """
+        self._current_state = state % len(self._states)
+
     def get_current_state(self):
         """
             Return the current state data of the piece
@@ -123,34 +380,187 @@ class Piece:
                     The first element is the bounding box of the smallest matrix
                     containing all elements, the second is the matrix itself
         """
-        # Create variable so they can be used outside their loops
-        i, j, k, l = 0, 0, 0, 0
+        return self.compute_bounds(self._current_state)
 
-        array = self._states[self._current_state]
-        shape = array.shape
+    def compute_bounds(self, state):
+        """
+            Returns the smallest array that contains all non zero elements of
+            a given state
 
-        for i in range(shape[1]):
-            non_zero = np.count_nonzero(array[:, i])
+            See also
+            --------
+                compute_current_bounds
 
-            if non_zero != 0:
-                break
+            Parameters
+            ----------
+                state: int
+                    The index of the state
 
-        for j in reversed(range(shape[1])):
-            non_zero = np.count_nonzero(array[:, j])
+            Returns
+            -------
+                tuple of 4 int, 2D-array_like
+                    The bounding box (top, bottom, left, right) and the bounded
+                    matrix
+        """
+        return self._bounds[state], self._bounded[state]
 
-            if non_zero != 0:
-                break
+    def compute_current_masks(self):
+        """
+            Returns the row masks of the smallest array that contains all non
+            zero elements
 
-        for k in range(shape[0]):
-            non_zero = np.count_nonzero(array[k, :])
+            Bit c of the r-th mask is set iff the element (r, c) of the bounded
+            array is non zero. They are meant for bitboard based games.
 
-            if non_zero != 0:
-                break
+            See also
+            --------
+                compute_current_bounds
 
-        for l in reversed(range(shape[0])):
-            non_zero = np.count_nonzero(array[l, :])
+            Returns
+            -------
+                tuple of 4 int, tuple of int
+                    The first element is the bounding box of the smallest matrix
+                    containing all elements, the second is the masks of each
+                    row of this matrix (from top to bottom)
+        """
+        return self.compute_masks(self._current_state)
 
-            if non_zero != 0:
-                break
+    def compute_masks(self, state):
+        """
+            Returns the row masks of a given state
+
+            See also
+            --------
+                compute_current_masks
+
+            Parameters
+            ----------
+                state: int
+                    The index of the state
+
+            Returns
+            -------
+                tuple of 4 int, tuple of int
+                    The bounding box and the row masks of the bounded matrix
+        """
+        return self._bounds[state], self._masks[state]
+
+    def compute_packed_masks(self, stride):
+        """
+            Returns the row masks of every state packed in a single integer
+
+            The mask of row r of the bounded matrix is shifted by r * stride
+            bits, as the rows of a board stored in a single integer.
+
+            See also
+            --------
+                compute_masks
+
+            Parameters
+            ----------
+                stride: int
+                    The number of bits of a row, at least the width of the
+                    states
+
+            Returns
+            -------
+                list of tuple of 4 int
+                    For each state : the top and the left of its bounding box,
+                    the number of rows of the bounded matrix and its packed
+                    masks
+        """
+        packed = self._packed_masks.get(stride)
+
+        if packed is None:
+            packed = [
+                (
+                    bounds[0], bounds[2], len(masks),
+                    sum(mask << (r * stride) for r, mask in enumerate(masks))
+                )
+                for bounds, masks in zip(self._bounds, self._masks)
+            ]
+            self._packed_masks[stride] = packed
+
+        return packed
+
+    def compute_bottom_profile(self, state=None):
+        """
+            Returns the bottom profile of a state
+
+            The bottom profile gives, for each column of the bounded matrix,
+            the row index of its lowest non zero element (-1 if the column is
+            empty). It is what is needed to drop a piece onto a stack.
+
+            Parameters
+            ----------
+                state: int or None
+                    The index of the state, default is the current state
+
+            Returns
+            -------
+                tuple of 4 int, 1D numpy array of int
+                    The bounding box and the bottom profile of the bounded
+                    matrix
+        """
+        if state is None:
+            state = self._current_state
+
+        return self._bounds[state], self._bottoms[state]
+
+    def compute_profile_tables(self):
+        """
+            Returns the profiles and cell counts of all the states at once
+
+            Row s of each table is the top profile, the bottom profile (see
+            compute_bottom_profile), the number of cells of each column or of
+            each row (see compute_cell_counts) of state s, padded with -1 for
+            profiles and 0 for cell counts.
+
+            Returns
+            -------
+                tuple of four 2D numpy array of int
+                    The top profiles, bottom profiles, column cells and row
+                    cells tables, of shape (number of states, size of the
+                    largest bounded array)
+        """
+        return self._profile_tables
+
+    def compute_cell_table(self):
+        """
+            Returns the cells of all the states at once
+
+            Returns
+            -------
+                3D numpy array of bool
+                    Element (s, r, c) is True iff the element (r, c) of the
+                    bounded matrix of state s is non zero, padded to the
+                    shape of compute_profile_tables
+        """
+        return self._cell_table
+
+    def compute_cell_counts(self, state=None):
+        """
+            Returns the top profile and the cell counts of a state
+
+            The top profile gives, for each column of the bounded matrix, the
+            row index of its highest non zero element (-1 if the column is
+            empty). Along with the number of non zero elements of each column
+            and of each row, it is what is needed to update the statistics of
+            a board when the piece is placed (see TetrisBase).
+
+            Parameters
+            ----------
+                state: int or None
+                    The index of the state, default is the current state
+
+            Returns
+            -------
+                tuple of 4 int, and three tuples of int
+                    The bounding box, the top profile, the number of cells of
+                    each column and the number of cells of each row of the
+                    bounded matrix
+        """
+        if state is None:
+            state = self._current_state
 
-        return (k, l, i, j), array[k:(l + 1), i:(j + 1)]
+        return (self._bounds[state],) + self._cell_counts[state]
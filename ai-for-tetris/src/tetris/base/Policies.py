@@ -0,0 +1,198 @@
+import numpy as np
+
+# Registered policy classes, by name
+POLICIES = {}
+
+
+def register_policy(name):
+    """
+        Class decorator registering a policy under a name
+
+        Parameters
+        ----------
+            name: str
+                The name of the policy, must be unique
+
+        Returns
+        -------
+            function
+                The decorator
+    """
+    def register(cls):
+        if name in POLICIES:
+            raise NameError("Policy already registered " + name)
+
+        cls.name = name
+        POLICIES[name] = cls
+        return cls
+
+    return register
+
+
+def create_policy(name, kwargs=None):
+    """
+        Creates a registered policy
+
+        Parameters
+        ----------
+            name: str
+                The name of the policy
+            kwargs: dict or None
+                The arguments of the policy
+
+        Returns
+        -------
+            Policy
+                The policy
+    """
+    if name not in POLICIES:
+        raise NameError("Undefined policy " + str(name))
+
+    return POLICIES[name](**(kwargs or {}))
+
+
+def get_policy(policy):
+    """
+        Returns a policy from one of its descriptions
+
+        Parameters
+        ----------
+            policy: str, tuple of str and dict or function
+                Either a policy name, a (name, arguments) tuple or any
+                function, which is returned as is
+
+        Returns
+        -------
+            function
+                The policy
+    """
+    if isinstance(policy, str):
+        return create_policy(policy)
+
+    if isinstance(policy, tuple):
+        return create_policy(*policy)
+
+    return policy
+
+
+class Policy:
+    """
+        Base class of named game policies
+
+        A policy is a function (see GameParameters) identified by its
+        registered name and its arguments. Unlike lambdas, policies are
+        pickled, compared and hashed by name and arguments, so the parameters
+        holding them can be sent to other processes and used as cache keys.
+
+        When vectorized is true, the policy also accepts numpy arrays in place
+        of each of its int arguments (see BatchTetris).
+    """
+    name = None
+    vectorized = False
+
+    def __init__(self, **kwargs):
+        """
+            Ctor
+
+            Parameters
+            ----------
+                kwargs: dict
+                    The arguments of the policy
+        """
+        self._kwargs = kwargs
+
+    def get_signature(self):
+        """
+            Returns the hashable description of the policy
+
+            Returns
+            -------
+                tuple
+                    The name and the sorted arguments of the policy
+        """
+        return self.name, tuple(sorted(self._kwargs.items()))
+
+    def __reduce__(self):
+        return create_policy, (self.name, self._kwargs)
+
+    def __eq__(self, other):
+        return isinstance(other, Policy) and \
+            self.get_signature() == other.get_signature()
+
+    def __hash__(self):
+        return hash(self.get_signature())
+
+    def __repr__(self):
+        arguments = ", ".join(
+            k + "=" + repr(v) for k, v in self.get_signature()[1]
+        )
+        return self.name + "(" + arguments + ")"
+
+
+@register_policy("constant_speed")
+class ConstantSpeed(Policy):
+    """
+        Speed update policy keeping the same speed
+    """
+    vectorized = True
+
+    def __call__(self, speed):
+        return speed
+
+
+@register_policy("quadratic_line_scoring")
+class QuadraticLineScoring(Policy):
+    """
+        Line scoring policy : line_score * lines ** 2 * (1 + level)
+    """
+    vectorized = True
+
+    def __init__(self, line_score=50):
+        """
+            Ctor
+
+            Parameters
+            ----------
+                line_score: int
+                    Score acquired for completing a single line in the first
+                    level
+        """
+        super().__init__(line_score=line_score)
+        self._line_score = line_score
+
+    def __call__(self, lines, level):
+        return self._line_score * lines ** 2 * (1 + level)
+
+
+@register_policy("position_piece_scoring")
+class PositionPieceScoring(Policy):
+    """
+        Piece scoring policy : (pos[0] + level + 1) ** 2
+    """
+    vectorized = True
+
+    def __call__(self, pos, level):
+        return (pos[0] + level + 1) ** 2
+
+
+@register_policy("every_n_lines")
+class EveryNLines(Policy):
+    """
+        Next level policy : a new level every n lines
+    """
+    vectorized = True
+
+    def __init__(self, n=40):
+        """
+            Ctor
+
+            Parameters
+            ----------
+                n: int
+                    The number of lines per level
+        """
+        super().__init__(n=n)
+        self._n = n
+
+    def __call__(self, level, lines):
+        return np.logical_and(lines % self._n == 0, lines != 0)
@@ -0,0 +1,344 @@
+import hashlib
+import struct
+
+import numpy as np
+
+# File header : magic, version, board height and width, game seed and
+# parameters fingerprint. Version 1 replays stored the seed on 32 bits
+MAGIC = b"TTRP"
+VERSION = 2
+HEADER = struct.Struct("<4sBBBQ8s")
+HEADERS = {1: struct.Struct("<4sBBBI8s"), VERSION: HEADER}
+
+# Event codes, ticks use the value of their control (1 to 7)
+EVENT_END = 0x00
+EVENT_PLACE = 0x10
+
+
+def _write_varint(stream, value):
+    """
+        Appends an unsigned integer to a stream (LEB128 encoding)
+
+        Parameters
+        ----------
+            stream: bytearray
+                The stream to write into
+            value: int
+                The positive integer to write
+    """
+    while True:
+        byte = value & 0x7f
+        value >>= 7
+
+        if value == 0:
+            stream.append(byte)
+            return
+
+        stream.append(byte | 0x80)
+
+
+def _read_varint(data, offset):
+    """
+        Reads an unsigned integer written by _write_varint
+
+        Parameters
+        ----------
+            data: bytes
+                The data to read from
+            offset: int
+                The position of the integer
+
+        Returns
+        -------
+            tuple of two int
+                The integer and the position following it
+    """
+    value, shift = 0, 0
+
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7f) << shift
+        shift += 7
+
+        if byte & 0x80 == 0:
+            return value, offset
+
+
+def compute_fingerprint(params):
+    """
+        Returns a short stable fingerprint of game parameters
+
+        The seed and the engine are not part of the fingerprint : a replay
+        can be run with any engine.
+
+        Parameters
+        ----------
+            params: GameParameters
+                The parameters
+
+        Returns
+        -------
+            bytes
+                8 bytes, all zeros when the parameters have no signature (see
+                GameParameters.get_signature)
+    """
+    try:
+        signature = params.get_signature()
+    except TypeError:
+        return bytes(8)
+
+    signature = signature[:2] + signature[3:-1]
+    return hashlib.sha1(repr(signature).encode()).digest()[:8]
+
+
+class ReplayRecorder:
+    """
+        Records the actions of a game, see TetrisBase.start_recording
+
+        Consecutive identical ticks are stored as a single event with a
+        count, so idle periods cost a few bytes.
+    """
+
+    def __init__(self, seed):
+        """
+            Ctor
+
+            Parameters
+            ----------
+                seed: int
+                    The seed of the recorded game
+        """
+        self.seed = seed
+        # Events are [code, count] for ticks and [code, rotation, column]
+        # for placements
+        self.events = []
+
+    def record_tick(self, mvt, count=1):
+        """
+            Records ticks
+
+            Parameters
+            ----------
+                mvt: tetris.base.Controls.Controls
+                    The action of the ticks
+                count: int
+                    The number of ticks
+        """
+        events = self.events
+
+        if len(events) != 0 and events[-1][0] == mvt.value:
+            events[-1][1] += count
+        else:
+            events.append([mvt.value, count])
+
+    def record_place(self, rotation, column):
+        """
+            Records a placement, see TetrisBase.place
+
+            Parameters
+            ----------
+                rotation: int
+                    The state of the placed piece
+                column: int
+                    The column of the placed piece
+        """
+        self.events.append([EVENT_PLACE, rotation, column])
+
+    def mark(self):
+        """
+            Returns the current position of the recording
+
+            Returns
+            -------
+                tuple of two int
+                    The number of events and the count of the last event
+        """
+        if len(self.events) == 0:
+            return 0, 0
+
+        return len(self.events), self.events[-1][1]
+
+    def rewind(self, mark):
+        """
+            Forgets everything recorded since a mark
+
+            Parameters
+            ----------
+                mark: tuple of two int
+                    A mark returned by the mark function
+        """
+        length, last = mark
+        del self.events[length:]
+
+        if length != 0:
+            self.events[-1][1] = last
+
+    def get_replay(self, tetris):
+        """
+            Returns the replay of the recording so far
+
+            Parameters
+            ----------
+                tetris: TetrisBase
+                    The recorded game, its current board, score and line count
+                    are the expected results of the replay
+
+            Returns
+            -------
+                Replay
+                    The replay
+        """
+        return Replay(
+            tetris._params,
+            self.seed,
+            [list(e) for e in self.events],
+            tetris._board[:-1, 1:-1] != 0,
+            tetris._score,
+            tetris._lines_count
+        )
+
+
+class Replay:
+    """
+        Deterministic replay of a game
+
+        A replay only holds the seed of the game and the stream of its
+        actions (ticks and placements), plus the final board, score and line
+        count so that a run can be verified bit for bit (see src.replay).
+    """
+
+    def __init__(self, params, seed, events, board, score, lines):
+        """
+            Ctor
+
+            Parameters
+            ----------
+                params: GameParameters or None
+                    The parameters of the recorded game, only used for the
+                    board size and the fingerprint
+                seed: int
+                    The seed of the game
+                events: list of list of int
+                    The recorded events, see ReplayRecorder
+                board: 2D array_like of bool
+                    The final board (without boundaries)
+                score: int
+                    The final score
+                lines: int
+                    The final number of lines
+        """
+        self.seed = seed
+        self.events = events
+        self.board = np.asarray(board, dtype=bool)
+        self.score = score
+        self.lines = lines
+        self.fingerprint = bytes(8) if params is None else \
+            compute_fingerprint(params)
+
+    def to_bytes(self):
+        """
+            Encodes the replay
+
+            Returns
+            -------
+                bytes
+                    The binary replay
+        """
+        height, width = self.board.shape
+        stream = bytearray(HEADER.pack(
+            MAGIC, VERSION, height, width, self.seed, self.fingerprint
+        ))
+
+        for event in self.events:
+            stream.append(event[0])
+
+            if event[0] == EVENT_PLACE:
+                stream.append(event[1])
+                stream.append(event[2])
+            else:
+                _write_varint(stream, event[1])
+
+        stream.append(EVENT_END)
+        _write_varint(stream, self.score)
+        _write_varint(stream, self.lines)
+        stream += np.packbits(self.board).tobytes()
+
+        return bytes(stream)
+
+    @staticmethod
+    def from_bytes(data):
+        """
+            Decodes a replay
+
+            Parameters
+            ----------
+                data: bytes
+                    A binary replay made by to_bytes
+
+            Returns
+            -------
+                Replay
+                    The replay
+        """
+        magic, version = data[:4], data[4]
+
+        if magic != MAGIC or version not in HEADERS:
+            raise ValueError("Not a replay (or unsupported version)")
+
+        header = HEADERS[version]
+        _, _, height, width, seed, fingerprint = header.unpack_from(data, 0)
+
+        offset = header.size
+        events = []
+
+        while data[offset] != EVENT_END:
+            code = data[offset]
+
+            if code == EVENT_PLACE:
+                events.append([code, data[offset + 1], data[offset + 2]])
+                offset += 3
+            else:
+                count, offset = _read_varint(data, offset + 1)
+                events.append([code, count])
+
+        score, offset = _read_varint(data, offset + 1)
+        lines, offset = _read_varint(data, offset)
+
+        bits = np.frombuffer(data, dtype=np.uint8, offset=offset)
+        board = np.unpackbits(bits)[:height * width].reshape(height, width)
+
+        replay = Replay(None, seed, events, board, score, lines)
+        replay.fingerprint = fingerprint
+
+        return replay
+
+    def save(self, path):
+        """
+            Saves the replay to a file
+
+            Parameters
+            ----------
+                path: str
+                    The path of the file
+        """
+        with open(path, "wb") as replay_file:
+            replay_file.write(self.to_bytes())
+
+    @staticmethod
+    def load(path):
+        """
+            Loads a replay from a file
+
+            Parameters
+            ----------
+                path: str
+                    The path of the file
+
+            Returns
+            -------
+                Replay
+                    The replay
+        """
+        with open(path, "rb") as replay_file:
+            return Replay.from_bytes(replay_file.read())
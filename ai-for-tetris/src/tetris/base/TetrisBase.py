@@ -1,17 +1,28 @@
+import os
+import time
+
 import numpy as np
 import pprint
 from copy import copy, deepcopy
+from collections import deque
 
 
 
 from src.tetris.base.Controls import Controls
-from src.tetris.base.Piece import Piece
+from src.tetris.base.Replay import ReplayRecorder
 
 
 class TetrisBase:
     """
            Class that handles Tetris base game
     """
+    # Movements that never place the piece, see _compute_movement
+    SHIFT_MOVEMENTS = (
+        Controls.LEFT,
+        Controls.RIGHT,
+        Controls.ROTATE_LEFT,
+        Controls.ROTATE_RIGHT
+    )
 
     def __init__(self, params):
         """
@@ -26,12 +37,17 @@ class TetrisBase:
         self._params = params
         # The class requires to maintain its own random state so multiple
         # instances can run in parallel with the "same randomness"
-        self._random = np.random.RandomState(self._params.seed)
+        # Without a seed one is drawn anyway so the game can be replayed
+        self._seed = self._params.seed
+        if self._seed is None:
+            self._seed = int.from_bytes(os.urandom(4), "little") >> 1
+        self._random = np.random.RandomState(self._seed)
 
         self._current_speed = self._params.initial_speed
         self._current_time = 0
 
         self._board = self._create_empty_board()
+        self._reset_board_stats()
         self._init_pieces()
 
         self._is_over = False
@@ -40,6 +56,12 @@ class TetrisBase:
         self._score = 0
         self._lines_count = 0
 
+        # Snapshots saved by push, see push and pop
+        self._undo_stack = []
+
+        # Recorder of the actions, see start_recording
+        self._recorder = None
+
     def tick(self, mvt=Controls.NOTHING):
         """
             Run a tick of the game
@@ -52,13 +74,140 @@ class TetrisBase:
         if self._is_over:
             return      
 
+        if self._recorder is not None:
+            self._recorder.record_tick(mvt)
+
         self._handle_movement(mvt)
         self._current_time += 1
 
         if self._current_time >= self._current_speed:
             # Timer is always reset for down actions
             self._handle_movement(Controls.DOWN)
-        
+
+    def advance(self, n):
+        """
+            Runs n ticks without any action
+
+            The result is exactly the one of n calls to tick(NOTHING) but the
+            idle ticks between two gravity steps are skipped at once, so the
+            cost does not depend on the speed of the game.
+
+            Parameters
+            ----------
+                n: int
+                    The number of ticks to run
+
+            Returns
+            -------
+                int
+                    The number of ticks run, less than n if the game ended
+        """
+        ticks = 0
+
+        while ticks < n and not self._is_over:
+            ticks += self._advance_piece(n - ticks, False)
+
+        if self._recorder is not None and ticks != 0:
+            self._recorder.record_tick(Controls.NOTHING, ticks)
+
+        return ticks
+
+    def advance_until_event(self, until_lock=False):
+        """
+            Runs ticks without any action until the next gravity step
+
+            Like advance, the idle ticks are skipped at once.
+
+            Parameters
+            ----------
+                until_lock: bool
+                    When true, runs until the current piece is locked (or the
+                    game ends) instead of stopping at the next gravity step
+
+            Returns
+            -------
+                int
+                    The number of ticks run, that is the number of calls to
+                    tick(NOTHING) having the same result
+        """
+        if self._is_over:
+            return 0
+
+        ticks = self._advance_piece(None, until_lock)
+
+        if self._recorder is not None:
+            self._recorder.record_tick(Controls.NOTHING, ticks)
+
+        return ticks
+
+    def _advance_piece(self, limit, until_lock):
+        """
+            Runs idle ticks for the current piece, see advance
+
+            Gravity moves the piece down every max(speed, 1) ticks, the first
+            step happening when the timer reaches the speed. The gravity step
+            following the last possible fall locks the piece.
+
+            Parameters
+            ----------
+                limit: int or None
+                    The maximum number of ticks to run, None for no limit
+                until_lock: bool
+                    Without limit, whether to run until the lock of the piece
+                    or only until the next gravity step
+
+            Returns
+            -------
+                int
+                    The number of ticks run, it stops after the lock of the
+                    piece in any case
+        """
+        period = max(self._current_speed, 1)
+        to_gravity = max(self._current_speed - self._current_time, 1)
+        drop = self._compute_drop_distance()
+
+        # Number of gravity steps to run, the last possible one locking
+        if limit is None:
+            steps = drop + 1 if until_lock else 1
+        elif limit < to_gravity:
+            self._current_time += limit
+            return limit
+        else:
+            steps = min((limit - to_gravity) // period + 1, drop + 1)
+
+        ticks = to_gravity + (steps - 1) * period
+
+        x, y = self._current_pos
+        self._current_pos = (x, y + min(steps, drop))
+        self._current_time = 0
+
+        if steps > drop:
+            self._lock_current_piece()
+        elif limit is not None:
+            # Remaining ticks are shorter than a gravity period
+            self._current_time = limit - ticks
+            ticks = limit
+
+        return ticks
+
+    def _compute_drop_distance(self):
+        """
+            Returns the number of rows the current piece can fall
+
+            Returns
+            -------
+                int
+                    The number of DOWN movements before the piece is blocked
+        """
+        piece = self._current_piece
+        x, y = self._current_pos
+
+        drop = 0
+        while self._check_for_piece((x, y + drop + 1), piece):
+            drop += 1
+
+        return drop
+
     def _handle_movement(self, mvt):
         """
             Inplace movement handling
@@ -76,72 +225,640 @@ class TetrisBase:
             if self._check_for_piece(bottom_pos, self._current_piece):
                 self._current_pos = bottom_pos
             else:
-                self._place_current_piece()
-                lines = self._process_lines()
-    
-                self._lines_count += lines
-                self._score += self._params.piece_scoring_policy(
-                    self._current_pos, self._level
-                )
-                self._score += self._params.line_scoring_policy(
-                    lines, self._level
-                )
-
-                next_level = self._params.next_level_policy(
-                    self._level, self._lines_count
-                )
-
-                if next_level:
-                    self._current_speed = self._params.speed_update_policy(
-                        self._current_speed
-                    )
-                    self._level += 1
-
-                self._draw_new_piece()
-
-                is_end = not self._check_for_piece(
-                    self._current_pos,
-                    self._current_piece
-                )
-
-                if is_end:
-                    self._end()
+                self._lock_current_piece()
 
             # When pressing down reset timer to prevent 'double tap' effects
             self._current_time = 0
-        elif mvt is Controls.LEFT:
-            left_pos = (self._current_pos[0] - 1, self._current_pos[1])
-
-            if self._check_for_piece(left_pos, self._current_piece):
-                self._current_pos = left_pos
-        elif mvt is Controls.RIGHT:
-            right_pos = (self._current_pos[0] + 1, self._current_pos[1])
-
-            if self._check_for_piece(right_pos, self._current_piece):
-                self._current_pos = right_pos
-        elif mvt is Controls.ROTATE_LEFT:
-            rotate_piece = Piece(self._current_piece.rotate_left())
-            rotate_pos = self._current_pos
-            rotate_pos = self._compute_rotation_pos(rotate_pos, rotate_piece)
-
-            if self._check_for_piece(rotate_pos, rotate_piece):
-                self._current_piece.rotate_left(perform=True)
-                self._current_pos = rotate_pos
-        elif mvt is Controls.ROTATE_RIGHT:
-            rotate_piece = Piece(self._current_piece.rotate_right())
-            rotate_pos = self._current_pos
-            rotate_pos = self._compute_rotation_pos(rotate_pos, rotate_piece)
-
-            if self._check_for_piece(rotate_pos, rotate_piece):
-                self._current_piece.rotate_right(perform=True)
-                self._current_pos = rotate_pos
+        elif mvt in TetrisBase.SHIFT_MOVEMENTS:
+            piece = self._current_piece
+            moved = self._compute_movement(
+                piece, piece.get_state_index(), self._current_pos, mvt
+            )
+
+            if moved is not None:
+                piece.set_state_index(moved[0])
+                self._current_pos = moved[1]
         elif mvt is Controls.STORE:
             # TODO : Implement piece storing
             pass
         else:
             raise NameError("Undefined control " + str(mvt))
 
-    def _check_for_piece(self, pos, piece):
+    def _compute_movement(self, piece, state, pos, mvt):
+        """
+            Computes the result of a movement without performing it
+
+            Parameters
+            ----------
+                piece: tetris.base.Piece
+                    The piece to move
+                state: int
+                    The state of the piece before the movement
+                pos: two int tuple
+                    The position of the piece before the movement
+                mvt: tetris.base.Controls.Controls
+                    The movement, either DOWN or one of SHIFT_MOVEMENTS
+
+            Returns
+            -------
+                tuple of int and two int tuple or None
+                    The state and position of the piece after the movement,
+                    None if the movement is blocked
+        """
+        if mvt is Controls.DOWN:
+            new_pos = (pos[0], pos[1] + 1)
+        elif mvt is Controls.LEFT:
+            new_pos = (pos[0] - 1, pos[1])
+        elif mvt is Controls.RIGHT:
+            new_pos = (pos[0] + 1, pos[1])
+        else:
+            direction = -1 if mvt is Controls.ROTATE_LEFT else +1
+            new_state = (state + direction) % piece.get_state_count()
+            new_pos = self._compute_rotation_pos(pos, piece, new_state)
+
+            if self._check_for_piece(new_pos, piece, new_state):
+                return new_state, new_pos
+            return None
+
+        if self._check_for_piece(new_pos, piece, state):
+            return state, new_pos
+        return None
+
+    def enumerate_placements(self):
+        """
+            Enumerates every placement reachable by the current piece
+
+            A breadth-first search is run over the (rotation, position) states
+            of the current piece using the movement rules of the game, hence
+            placements that need a slide under an overhang are found. Gravity
+            is ignored : moves are assumed to be faster than the fall.
+
+            A placement is a spot where the piece cannot go down anymore. Two
+            placements filling the same cells (such as the rotations of the O
+            piece) are the same placement, each one is returned once with a
+            shortest list of moves reaching it. States one rotation period
+            apart (see Piece.get_rotation_period) are explored once.
+
+            See search_placements to only build the moves of some placements.
+
+            Returns
+            -------
+                list of tuple
+                    For each placement : the list of moves that places the
+                    piece (the last one being the DOWN locking it) and the
+                    placement itself as a (state, position) tuple, see
+                    try_placement
+        """
+        placements, parents = self.search_placements()
+
+        return [
+            (self.trace_moves(parents, placement), placement)
+            for placement in placements
+        ]
+
+    def search_placements(self, deadline=None, target=None):
+        """
+            Finds every placement reachable by the current piece
+
+            This is the search of enumerate_placements, without building the
+            moves of each placement : they are built on demand by
+            trace_moves.
+
+            Parameters
+            ----------
+                deadline: float or None
+                    When given, the search stops at this time (see
+                    time.perf_counter) as soon as a placement is found. Only
+                    the placements found so far, the ones reached with the
+                    fewest movements, are returned
+                target: tuple of int and two int tuple or None
+                    When given, a placement found by a previous search : the
+                    search stops as soon as it is reached, the parents are
+                    then enough to trace its moves (the same ones as after a
+                    whole search)
+
+            Returns
+            -------
+                list of tuple, dict
+                    The placements as (state, position) tuples (see
+                    try_placement), and the movement and previous node leading
+                    to each explored node, to be given to trace_moves
+        """
+        if self._is_over:
+            return [], {}
+
+        piece = self._current_piece
+        period = piece.get_rotation_period()
+        symmetric = period != piece.get_state_count()
+        start = (piece.get_state_index() % period, self._current_pos)
+
+        # Movement (and previous node) leading to each visited node
+        parents = {start: None}
+        queue = deque([start])
+
+        placements = []
+        footprints = set()
+
+        if start == target:
+            return placements, parents
+
+        while len(queue) != 0:
+            if deadline is not None and len(placements) != 0 and \
+                    time.perf_counter() >= deadline:
+                break
+
+            node = queue.popleft()
+            state, pos = node
+
+            for mvt in TetrisBase.SHIFT_MOVEMENTS + (Controls.DOWN, ):
+                moved = self._compute_movement(piece, state, pos, mvt)
+
+                if moved is None:
+                    if mvt is Controls.DOWN:
+                        self._add_placement(
+                            piece, node, placements, footprints
+                        )
+                    continue
+
+                if symmetric:
+                    moved = (moved[0] % period, moved[1])
+
+                if moved not in parents:
+                    parents[moved] = (node, mvt)
+                    queue.append(moved)
+
+                    if moved == target:
+                        return placements, parents
+
+        return placements, parents
+
+    def _add_placement(self, piece, node, placements, footprints):
+        """
+            Adds a placement found by search_placements
+
+            Parameters
+            ----------
+                piece: tetris.base.Piece
+                    The placed piece
+                node: tuple of int and two int tuple
+                    The state and position of the piece
+                placements: list
+                    The placements found so far, see search_placements
+                footprints: set
+                    The cells filled by the placements found so far
+        """
+        state, pos = node
+        indices, masks = piece.compute_masks(state)
+        footprint = (masks, pos[1] + indices[0], pos[0] + indices[2])
+
+        if footprint in footprints:
+            return
+        footprints.add(footprint)
+
+        placements.append(node)
+
+    def trace_moves(self, parents, placement):
+        """
+            Builds the moves reaching a placement found by search_placements
+
+            Parameters
+            ----------
+                parents: dict
+                    The movement and previous node leading to each node, as
+                    returned by search_placements
+                placement: tuple of int and two int tuple
+                    The state and position of the piece
+
+            Returns
+            -------
+                list of tetris.base.Controls.Controls
+                    A shortest list of moves that places the piece, the last
+                    one being the DOWN locking it
+        """
+        node = placement
+        moves = [Controls.DOWN]
+
+        while parents[node] is not None:
+            node, mvt = parents[node]
+            moves.append(mvt)
+
+        return moves[::-1]
+
+    def try_placement(self, placement):
+        """
+            Try a placement found by enumerate_placements
+
+            The current piece is locked at the placement then the game is
+            restored, see try_moves.
+
+            Parameters
+            ----------
+                placement: tuple of int and two int tuple
+                    The state and position of the piece
+
+            Returns
+            -------
+                tuple
+                    The resulting board (without boundaries),
+                    the new total number of lines cleared,
+                    the resulting score
+        """
+        self.push()
+        self.lock_placement(placement)
+
+        result = (self._board[:-1, 1:-1].copy(),
+                  self._lines_count, self._score)
+        self.pop()
+
+        return result
+
+    def enumerate_drops(self):
+        """
+            Enumerates the hard drops of the current piece, see place
+
+            There is one drop per distinct state of the piece (see
+            Piece.get_distinct_states) and per column where the piece fits in
+            the width of the board. Whether a drop can be reached by moves
+            from the current position is not checked.
+
+            Returns
+            -------
+                list of tuple of two int
+                    The rotation and column of each drop
+        """
+        if self._is_over:
+            return []
+
+        piece = self._current_piece
+        width = self._params.board_size[1]
+        drops = []
+
+        for state in piece.get_distinct_states():
+            indices, _ = piece.compute_bounds(state)
+
+            for column in range(width - indices[3] + indices[2]):
+                drops.append((state, column))
+
+        return drops
+
+    def try_drop(self, rotation, column):
+        """
+            Try a hard drop, see place
+
+            The game is restored after the drop, see try_moves.
+
+            Parameters
+            ----------
+                rotation: int
+                    The index of the state of the piece
+                column: int
+                    The column of the left side of the piece bounding box
+
+            Returns
+            -------
+                tuple
+                    The resulting board (without boundaries),
+                    the new total number of lines cleared,
+                    the resulting score
+        """
+        self.push()
+        self.place(rotation, column)
+
+        result = (self._board[:-1, 1:-1].copy(),
+                  self._lines_count, self._score)
+        self.pop()
+
+        return result
+
+    def lock_placement(self, placement):
+        """
+            Locks the current piece at a placement found by
+            enumerate_placements
+
+            The placement is not part of a recording (see start_recording),
+            the game is meant to be restored (see push and pop) to explore
+            the following pieces.
+
+            Parameters
+            ----------
+                placement: tuple of int and two int tuple
+                    The state and position of the piece
+
+            Returns
+            -------
+                int
+                    The number of line that were removed
+        """
+        self._current_piece.set_state_index(placement[0])
+        self._current_pos = placement[1]
+
+        return self._lock_current_piece()
+
+    def _lock_current_piece(self):
+        """
+            Locks the current piece at its current position
+
+            The piece is placed on the board, completed lines are removed,
+            score, lines and level are updated and the next piece is drawn.
+            The game ends if the new piece cannot be spawned.
+
+            Returns
+            -------
+                int
+                    The number of line that were removed
+        """
+        self._place_current_piece()
+        full_rows = self._add_piece_to_stats()
+        lines = self._process_lines(full_rows)
+
+        if lines != 0:
+            self._remove_rows_from_stats(full_rows)
+
+        self._lines_count += lines
+        self._score += self._params.piece_scoring_policy(
+            self._current_pos, self._level
+        )
+        self._score += self._params.line_scoring_policy(
+            lines, self._level
+        )
+
+        next_level = self._params.next_level_policy(
+            self._level, self._lines_count
+        )
+
+        if next_level:
+            self._current_speed = self._params.speed_update_policy(
+                self._current_speed
+            )
+            self._level += 1
+
+        self._draw_new_piece()
+
+        is_end = not self._check_for_piece(
+            self._current_pos,
+            self._current_piece
+        )
+
+        if is_end:
+            self._end()
+
+        return lines
+
+    def place(self, rotation, column):
+        """
+            Places the current piece with an analytic hard drop
+
+            The landing row is computed in one step from the column heights
+            and the bottom profile of the piece, then the piece is locked
+            exactly like a normal drop (same scoring, line clear and level
+            logic). The piece is dropped straight down from above the stack:
+            whether the spot can be reached from the spawn position is not
+            checked. When the stack is too high for the piece to fit in the
+            given columns, the game ends.
+
+            Parameters
+            ----------
+                rotation: int
+                    The index of the state of the piece to place
+                column: int
+                    The board column (boundaries excluded, 0 being the
+                    leftmost one) of the left side of the piece bounding box
+
+            Returns
+            -------
+                int
+                    The number of line that were removed
+        """
+        if self._is_over:
+            return 0
+
+        size = self._params.board_size
+        piece = self._current_piece
+
+        if rotation < 0 or rotation >= piece.get_state_count():
+            raise ValueError("Undefined rotation " + str(rotation))
+
+        indices, profile = piece.compute_bottom_profile(rotation)
+        width = indices[3] - indices[2] + 1
+
+        if column < 0 or column + width > size[1]:
+            raise ValueError("Column out of the board " + str(column))
+
+        # Row of the highest block of each covered column (floor if none)
+        surface = size[0] - self.get_column_heights()[column:column + width]
+        covered = profile >= 0
+        landing = np.min(surface[covered] - profile[covered] - 1)
+
+        pos = (column + 1 - indices[2], int(landing) - indices[0])
+
+        if self._recorder is not None:
+            self._recorder.record_place(rotation, column)
+
+        # A new piece always starts at the top
+        self._current_time = 0
+
+        if pos[1] < 0:
+            self._end()
+            return 0
+
+        piece.set_state_index(rotation)
+        self._current_pos = pos
+
+        return self._lock_current_piece()
+
+    def get_column_heights(self):
+        """
+            Returns the height of each column of the board
+
+            The height of a column is the number of rows between the floor and
+            its highest block (included), 0 for an empty column.
+
+            Returns
+            -------
+                1D numpy array of int
+                    The height of each column (boundaries excluded)
+        """
+        return np.array(self._column_heights)
+
+    def get_column_holes(self):
+        """
+            Returns the number of holes of each column of the board
+
+            A hole is an empty cell below the highest block of its column.
+
+            Returns
+            -------
+                1D numpy array of int
+                    The number of holes of each column (boundaries excluded)
+        """
+        return np.array(self._column_holes)
+
+    def get_row_fills(self):
+        """
+            Returns the number of blocks of each row of the board
+
+            Returns
+            -------
+                1D numpy array of int
+                    The number of blocks of each row (boundaries excluded),
+                    from top to bottom
+        """
+        return np.array(self._row_fills)
+
+    def get_board_stats(self):
+        """
+            Returns the statistics of the board without any copy
+
+            Returns
+            -------
+                tuple of three tuples of int
+                    The column heights, column holes and row fills, see
+                    get_column_heights, get_column_holes and get_row_fills
+        """
+        return self._column_heights, self._column_holes, self._row_fills
+
+    def get_board_key(self):
+        """
+            Returns a hashable key of the board
+
+            Two boards have the same key iff they have the same filled cells,
+            such keys are meant for transposition tables.
+
+            Returns
+            -------
+                bytes
+                    The filled cells of the board (boundaries excluded),
+                    packed as bits
+        """
+        return np.packbits(self._board[:-1, 1:-1] != 0).tobytes()
+
+    def _reset_board_stats(self):
+        """
+            Computes the board statistics from scratch
+
+            Column heights, column holes and row fills are then updated at
+            each lock, only looking at the rows and columns of the piece, see
+            _add_piece_to_stats and _remove_rows_from_stats. They are stored
+            as tuples so that snapshots can share them.
+        """
+        height = self._params.board_size[0]
+        filled = self._board[:-1, 1:-1] != 0
+
+        tops = np.argmax(filled, axis=0)
+        heights = np.where(filled.any(axis=0), height - tops, 0)
+
+        self._column_heights = tuple(int(h) for h in heights)
+        self._column_holes = tuple(
+            int(h) for h in heights - np.count_nonzero(filled, axis=0)
+        )
+        self._row_fills = tuple(
+            int(f) for f in np.count_nonzero(filled, axis=1)
+        )
+
+    def _add_piece_to_stats(self):
+        """
+            Updates the board statistics after the current piece was placed
+
+            Returns
+            -------
+                list of int
+                    The indices of the rows that are now full, in ascending
+                    order
+        """
+        height, width = self._params.board_size
+        indices, tops, column_cells, row_cells = \
+            self._current_piece.compute_cell_counts()
+
+        top = self._current_pos[1] + indices[0]
+        left = self._current_pos[0] + indices[2] - 1
+
+        heights = list(self._column_heights)
+        holes = list(self._column_holes)
+
+        for c, piece_top in enumerate(tops):
+            if piece_top < 0:
+                continue
+
+            column = left + c
+            old_height = heights[column]
+            new_height = max(old_height, height - top - piece_top)
+
+            # Blocks of a column are its height minus its holes
+            blocks = old_height - holes[column] + column_cells[c]
+            heights[column] = new_height
+            holes[column] = new_height - blocks
+
+        fills = list(self._row_fills)
+        full_rows = []
+
+        for r, cells in enumerate(row_cells):
+            fills[top + r] += cells
+
+            if fills[top + r] == width:
+                full_rows.append(top + r)
+
+        self._column_heights = tuple(heights)
+        self._column_holes = tuple(holes)
+        self._row_fills = tuple(fills)
+
+        return full_rows
+
+    def _remove_rows_from_stats(self, full_rows):
+        """
+            Updates the board statistics after full rows were removed
+
+            A column only needs to be scanned again when its highest block was
+            in a removed row : otherwise it loses one block and one row of
+            height per removed row and keeps its holes.
+
+            Parameters
+            ----------
+                full_rows: list of int
+                    The indices of the removed rows
+        """
+        height, width = self._params.board_size
+        removed = set(full_rows)
+
+        heights = list(self._column_heights)
+        holes = list(self._column_holes)
+
+        for c in range(width):
+            if height - heights[c] in removed:
+                blocks = heights[c] - holes[c] - len(removed)
+                heights[c] = self._scan_column_height(c)
+                holes[c] = heights[c] - blocks
+            else:
+                heights[c] -= len(removed)
+
+        self._column_heights = tuple(heights)
+        self._column_holes = tuple(holes)
+        self._row_fills = (0, ) * len(removed) + tuple(
+            f for r, f in enumerate(self._row_fills) if r not in removed
+        )
+
+    def _scan_column_height(self, column):
+        """
+            Computes the height of a column from the board
+
+            Parameters
+            ----------
+                column: int
+                    The column (boundaries excluded)
+
+            Returns
+            -------
+                int
+                    The height of the column, see get_column_heights
+        """
+        height = self._params.board_size[0]
+        filled = self._board[:height, column + 1] != 0
+
+        if not filled.any():
+            return 0
+
+        return height - int(np.argmax(filled))
+
+    def _check_for_piece(self, pos, piece, state=None):
         """
             Check if a current position is valid for a piece
 
@@ -156,19 +873,29 @@ class TetrisBase:
                     The position to check for
                 piece: tetris.base.Piece
                     The piece to check for
+                state: int or None
+                    The state of the piece to check for, default is the
+                    current state of the piece
 
             Returns
             -------
                 bool
                     True if the piece is at a valid position, false otherwise
         """
-        indices, piece_data = piece.compute_current_bounds()
+        if state is None:
+            state = piece.get_state_index()
+
+        indices, piece_data = piece.compute_bounds(state)
 
         top = pos[1] + indices[0]
         left = pos[0] + indices[2]
         bottom = pos[1] + indices[1]
         right = pos[0] + indices[3]
 
+        # Rotations may push the piece below the last row
+        if bottom > self._params.board_size[0]:
+            return False
+
         board_data = self._board[top:bottom + 1, left:right + 1]
         return np.count_nonzero(piece_data * board_data) == 0
 
@@ -188,37 +915,35 @@ class TetrisBase:
                 if piece_data[i - top][j - left] != 0:
                     self._board[i][j] = piece_data[i - top][j - left]
 
-    def _process_lines(self):
+    def _process_lines(self, full_rows):
         """
             Removes the completed lines
 
+            Parameters
+            ----------
+                full_rows: list of int
+                    The indices of the full rows, see _add_piece_to_stats
+
             Returns
             -------
                 int
                     The number of line that were removed
         """
-        size = self._params.board_size
-        board = self._create_empty_board()
+        if len(full_rows) == 0:
+            return 0
 
-        line_count = 0
+        height = self._params.board_size[0]
+        line_count = len(full_rows)
 
-        current_offset = size[0] - 1
-        for i in reversed(range(0, size[0])):
-            # Check if the line is full
-            if np.count_nonzero(self._board[i]) == size[1] + 2:
-                # Increment line_count and ignore copying current line without
-                # decrement current_offset to make the drop down effect
-                line_count = line_count + 1
-            else:
-                # Line is not filled, copy current line then try copying the
-                # above line
-                board[current_offset] = self._board[i]
-                current_offset = current_offset - 1
+        # Remaining lines drop down, new empty lines come from the top
+        kept = np.delete(self._board[:height], full_rows, axis=0)
+        board = self._create_empty_board()
+        board[line_count:height] = kept
 
         self._board = board
         return line_count
 
-    def _compute_rotation_pos(self, pos, rotated_piece):
+    def _compute_rotation_pos(self, pos, piece, state):
         """
             Compute position for rotation
 
@@ -234,8 +959,10 @@ class TetrisBase:
             ----------
                 pos: tuple of two int
                     The current position of the piece (before rotation)
-                rotated_piece: tetris.base.Piece
-                    The rotated piece
+                piece: tetris.base.Piece
+                    The piece to rotate
+                state: int
+                    The state of the piece after the rotation
 
             Returns
             -------
@@ -244,7 +971,7 @@ class TetrisBase:
                     the boundary
         """
         size = self._params.board_size
-        indices, _ = rotated_piece.compute_current_bounds()
+        indices, _ = piece.compute_bounds(state)
 
         # Position may be negative so take into account boundary and eventual
         # shifting
@@ -300,9 +1027,9 @@ class TetrisBase:
         self._current_piece = self._next_piece
 
         random_piece = self._random.randint(0, len(self._params.pieces))
-        # Deepcopy required since the list might be shared with other instances
+        # Copy required since the list might be shared with other instances
         # and we do not want to alter its content
-        self._next_piece = deepcopy(self._params.pieces[random_piece])
+        self._next_piece = self._params.pieces[random_piece].get_copy()
 
         # Sets position to be the middle of the game
         if self._current_piece is not None:
@@ -344,6 +1071,7 @@ class TetrisBase:
         self._level = 0
         self._score = 0
         self._board = self._create_empty_board()
+        self._reset_board_stats()
         self._draw_new_piece()
 
     def _end(self):
@@ -361,34 +1089,203 @@ class TetrisBase:
             Note : This function exists because other subclasses have
             non pickle-able attributes, preventing deepcopy to work...
 
+            The parameters are shared with the copy, they are never modified
+            by the game. Prefer snapshot / restore or push / pop to explore
+            moves on the same game, they do not allocate a new game.
+
             Returns
             -------
                 TetrisBase
                     A perfect copy of the current game
         """
-        copy = TetrisBase(self._params)
-    
-        #pp = pprint.PrettyPrinter(indent = 4)
-        #pp.pprint(self.__dict__)
-
-        copy._params = deepcopy(self._params)
-        copy._random = deepcopy(self._random)
-        copy._current_speed = deepcopy(self._current_speed)
-        copy._current_time  = deepcopy(self._current_time)
-        copy._board = deepcopy(self._board)
-        copy._is_over = deepcopy(self._is_over)
-        copy._level   = deepcopy(self._level)
-        copy._score   = deepcopy(self._score)
-        copy._lines_count = deepcopy(self._lines_count)
-        copy._next_piece = deepcopy(self._next_piece)
-        copy._current_piece = deepcopy(self._current_piece)
-        copy._current_pos = deepcopy(self._current_pos)
-        copy._store_piece = deepcopy(self._store_piece)
-        
-        #pp.pprint(copy.__dict__)
+        copy = self._create_copy()
+        copy.restore(self.snapshot())
+
+        # Pieces are mutable (rotations) hence cannot be shared
+        copy._current_piece = self._current_piece.get_copy()
+        copy._next_piece = self._next_piece.get_copy()
 
         return copy
 
+    def snapshot(self):
+        """
+            Saves the mutable state of the game
+
+            Only what a game can modify is saved : board (and its statistics),
+            pieces (and their rotation), position, timers, counters and the
+            position of the random number generator. Parameters are not part
+            of the snapshot.
+
+            See also
+            --------
+                restore
+                push
+
+            Returns
+            -------
+                tuple
+                    An opaque snapshot, to be given to restore
+        """
+        return (
+            self._get_board_state(),
+            self._random.get_state(),
+            self._current_speed,
+            self._current_time,
+            self._is_over,
+            self._level,
+            self._score,
+            self._lines_count,
+            self._current_piece,
+            self._current_piece.get_state_index(),
+            self._next_piece,
+            self._next_piece.get_state_index(),
+            self._current_pos,
+            self._store_piece,
+            self._column_heights,
+            self._column_holes,
+            self._row_fills,
+            None if self._recorder is None else self._recorder.mark()
+        )
+
+    def restore(self, snapshot):
+        """
+            Restores the game to a snapshot
+
+            The same snapshot can be restored any number of times.
+
+            Parameters
+            ----------
+                snapshot: tuple
+                    A snapshot returned by the snapshot function of this game
+        """
+        self._restore(snapshot, True)
+
+    def push(self):
+        """
+            Saves the current state of the game on the undo stack
+
+            See also
+            --------
+                pop
+        """
+        self._undo_stack.append(self.snapshot())
+
+    def pop(self):
+        """
+            Restores the game to the state saved by the last push
+
+            See also
+            --------
+                push
+        """
+        self._restore(self._undo_stack.pop(), False)
+
+    def _restore(self, snapshot, copy_board):
+        """
+            Restores the game to a snapshot
+
+            Parameters
+            ----------
+                snapshot: tuple
+                    The snapshot to restore
+                copy_board: bool
+                    When false the board of the snapshot is used as is, which
+                    is only valid if the snapshot is never used again
+        """
+        (board, random_state,
+         self._current_speed, self._current_time, self._is_over,
+         self._level, self._score, self._lines_count,
+         current_piece, current_state, next_piece, next_state,
+         self._current_pos, self._store_piece,
+         self._column_heights, self._column_holes, self._row_fills,
+         mark) = snapshot
+
+        self._set_board_state(board, copy_board)
+        self._random.set_state(random_state)
+
+        # Pieces may have been rotated since the snapshot
+        current_piece.set_state_index(current_state)
+        next_piece.set_state_index(next_state)
+        self._current_piece = current_piece
+        self._next_piece = next_piece
+
+        # Actions undone by the restoration are not part of the recording
+        if self._recorder is not None and mark is not None:
+            self._recorder.rewind(mark)
+
+    def _get_board_state(self):
+        """
+            Returns a copy of the board, see snapshot
+
+            Returns
+            -------
+                2D numpy array
+                    A copy of the board
+        """
+        return self._board.copy()
+
+    def _set_board_state(self, board, copy_board):
+        """
+            Sets the board from a copy made by _get_board_state
+
+            Parameters
+            ----------
+                board: 2D numpy array
+                    The board to set
+                copy_board: bool
+                    Whether the board must be copied before being used
+        """
+        self._board = board.copy() if copy_board else board
+
+    def _create_copy(self):
+        """
+            Creates the instance used by get_copy
+
+            Subclasses using another board representation override this
+            function so their copies keep the same representation.
+
+            Returns
+            -------
+                TetrisBase
+                    A new game built with the same parameters
+        """
+        return TetrisBase(self._params)
+
+    def start_recording(self):
+        """
+            Starts recording the game for a replay
+
+            Only the seed of the game and its actions (ticks and placements)
+            are recorded. Actions undone by restore or pop (hence the ones
+            explored by try_moves and try_placement) are removed from the
+            recording. The recording must start before the first action of
+            the game.
+
+            See also
+            --------
+                stop_recording
+                tetris.base.Replay.Replay
+        """
+        self._recorder = ReplayRecorder(self._seed)
+
+    def stop_recording(self):
+        """
+            Stops recording the game
+
+            Returns
+            -------
+                tetris.base.Replay.Replay or None
+                    The replay of the game up to now, None if the game was not
+                    recorded
+        """
+        if self._recorder is None:
+            return None
+
+        replay = self._recorder.get_replay(self)
+        self._recorder = None
+
+        return replay
+
     def try_moves(self, moves):
         """
             Try a set of moves until a piece is placed
@@ -406,24 +1303,29 @@ class TetrisBase:
                     the new total number of lines cleared, 
                     the resulting score
         """
-        m = deepcopy(moves)
-        tetris_copy = self.get_copy()
+        m = list(moves)
+        # The moves are played on the game itself then undone
+        self.push()
 
-        score = tetris_copy._score
-        new_score = tetris_copy._score
+        score = self._score
+        new_score = self._score
 
         i = 0
-        while score == new_score and not tetris_copy._is_over:
+        while score == new_score and not self._is_over:
             if i < len(m):
-                tetris_copy.tick(m[i])
+                self.tick(m[i])
             else:
                 m.append(Controls.DOWN)
-                tetris_copy.tick(Controls.DOWN)
+                self.tick(Controls.DOWN)
 
             i = i + 1
-            new_score = tetris_copy._score
+            new_score = self._score
 
         if i < len(m):
             m = m[:i]
 
-        return m, deepcopy(tetris_copy._board[:-1, 1:-1]), tetris_copy._lines_count, tetris_copy._score
\ No newline at end of file
+        result = (m, self._board[:-1, 1:-1].copy(),
+                  self._lines_count, self._score)
+        self.pop()
+
+        return result
\ No newline at end of file
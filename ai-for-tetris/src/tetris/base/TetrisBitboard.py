@@ -0,0 +1,304 @@
+import numpy as np
+
+from src.tetris.base.Controls import Controls
+from src.tetris.base.TetrisBase import TetrisBase
+
+
+class TetrisBitboard(TetrisBase):
+    """
+        Class that handles Tetris base game using a bitboard
+
+        The whole board (boundaries included) is stored as a single integer :
+        each row is a mask whose bit j is set iff the j-th cell of the row is
+        filled, row r being shifted by r times the width of a row. A
+        collision is then a single AND between the board and the packed masks
+        of the piece shifted to its position, and a line is full iff its mask
+        is equal to the full mask.
+
+        The game logic is identical to TetrisBase which remains the reference
+        implementation. The _board attribute is still available as a numpy
+        array : it is built on demand and kept until the board changes (a
+        piece is locked or a snapshot restored). It must not be modified,
+        use get_rows to access the raw masks.
+
+        Note : cells only hold filled / empty information, every filled cell
+        of _board is set to 1.
+    """
+
+    def __init__(self, params):
+        """
+            Constructor
+
+            Parameters
+            ----------
+                params: GameParameters
+                    Parameters for the game. See class documentation for more
+                    details
+        """
+        size = params.board_size
+
+        # Number of bits of a row, number of rows (floor included), mask of
+        # a row only made of boundaries and of a full row
+        self._stride = size[1] + 2
+        self._row_count = size[0] + 1
+        self._empty_mask = 1 | (1 << (size[1] + 1))
+        self._full_mask = (1 << self._stride) - 1
+
+        # Cells of each column (boundaries excluded) above the floor
+        self._column_masks = [
+            sum(1 << (r * self._stride + c + 1) for r in range(size[0]))
+            for c in range(size[1])
+        ]
+
+        self._board_array = None
+
+        super().__init__(params)
+
+    @property
+    def _board(self):
+        """
+            The board as a numpy array, see TetrisBase
+        """
+        if self._board_array is None:
+            cell_count = self._row_count * self._stride
+            data = self._bits.to_bytes((cell_count + 7) // 8, "little")
+            cells = np.unpackbits(np.frombuffer(data, dtype=np.uint8),
+                                  bitorder="little")
+
+            board = cells[:cell_count].reshape(self._row_count, self._stride)
+            self._board_array = board.astype(float)
+            self._board_array.setflags(write=False)
+
+        return self._board_array
+
+    @_board.setter
+    def _board(self, board):
+        """
+            Sets the board from a numpy array, see TetrisBase
+        """
+        cells = np.packbits(np.asarray(board) != 0, bitorder="little")
+        self._bits = int.from_bytes(cells.tobytes(), "little")
+        self._board_array = None
+
+    def get_rows(self):
+        """
+            Returns the board row masks
+
+            Returns
+            -------
+                list of int
+                    The mask of each row of the board, boundaries included
+        """
+        return [
+            (self._bits >> (r * self._stride)) & self._full_mask
+            for r in range(self._row_count)
+        ]
+
+    def get_board_key(self):
+        """
+            Returns a hashable key of the board, see TetrisBase
+
+            Returns
+            -------
+                int
+                    The board, boundaries included
+        """
+        return self._bits
+
+    def _check_for_piece(self, pos, piece, state=None):
+        """
+            Check if a current position is valid for a piece
+
+            A piece is considered in a valid spot iff its packed masks
+            shifted to the position do not intersect the board.
+
+            Parameters
+            ----------
+                pos: two int tuple
+                    The position to check for
+                piece: tetris.base.Piece
+                    The piece to check for
+                state: int or None
+                    The state of the piece to check for, default is the
+                    current state of the piece
+
+            Returns
+            -------
+                bool
+                    True if the piece is at a valid position, false otherwise
+        """
+        if state is None:
+            state = piece.get_state_index()
+
+        top, left, height, masks = \
+            piece.compute_packed_masks(self._stride)[state]
+        top += pos[1]
+
+        # Rotations may push the piece below the last row
+        if top + height > self._row_count:
+            return False
+
+        return not self._bits & (masks << (top * self._stride + pos[0] + left))
+
+    def tick(self, mvt=Controls.NOTHING):
+        """
+            Run a tick of the game, see TetrisBase.tick
+
+            Parameters
+            ----------
+                mvt: tetris.base.Controls.Controls
+                    The action to perform on this tick
+        """
+        if self._is_over:
+            return
+
+        if self._recorder is not None:
+            self._recorder.record_tick(mvt)
+
+        if mvt is not Controls.NOTHING:
+            self._handle_movement(mvt)
+        self._current_time += 1
+
+        if self._current_time >= self._current_speed:
+            # Timer is always reset for down actions
+            self._handle_movement(Controls.DOWN)
+
+    def _handle_movement(self, mvt):
+        """
+            Inplace movement handling, see TetrisBase._handle_movement
+
+            Translations are checked directly against the packed masks of
+            the piece, rotations are left to TetrisBase.
+
+            Parameters
+            ----------
+                mvt: tetris.base.Controls.Controls
+                    The movement to process
+        """
+        if mvt is Controls.NOTHING:
+            return
+
+        x, y = self._current_pos
+        if mvt is Controls.DOWN:
+            y += 1
+        elif mvt is Controls.LEFT:
+            x -= 1
+        elif mvt is Controls.RIGHT:
+            x += 1
+        else:
+            super()._handle_movement(mvt)
+            return
+
+        piece = self._current_piece
+        top, left, height, masks = \
+            piece.compute_packed_masks(self._stride)[piece.get_state_index()]
+        top += y
+
+        if top + height <= self._row_count and \
+                not self._bits & (masks << (top * self._stride + x + left)):
+            self._current_pos = (x, y)
+        elif mvt is Controls.DOWN:
+            self._lock_current_piece()
+
+        # When pressing down reset timer to prevent 'double tap' effects
+        if mvt is Controls.DOWN:
+            self._current_time = 0
+
+    def _place_current_piece(self):
+        """
+            Place the current piece on the board
+        """
+        piece = self._current_piece
+        top, left, _, masks = \
+            piece.compute_packed_masks(self._stride)[piece.get_state_index()]
+
+        top += self._current_pos[1]
+        left += self._current_pos[0]
+
+        self._bits |= masks << (top * self._stride + left)
+        self._board_array = None
+
+    def _process_lines(self, full_rows):
+        """
+            Removes the completed lines
+
+            Parameters
+            ----------
+                full_rows: list of int
+                    The indices of the full rows, in ascending order, see
+                    TetrisBase._add_piece_to_stats
+
+            Returns
+            -------
+                int
+                    The number of line that were removed
+        """
+        stride = self._stride
+        bits = self._bits
+
+        # Rows above a full row drop down by one row, an empty row comes
+        # from the top. The rows below are left as they are, hence the
+        # indices of the next full rows remain valid
+        for row in full_rows:
+            above = bits & ((1 << (row * stride)) - 1)
+            below = bits >> ((row + 1) * stride) << ((row + 1) * stride)
+            bits = (above << stride) | below | self._empty_mask
+
+        if len(full_rows) != 0:
+            self._bits = bits
+            self._board_array = None
+
+        return len(full_rows)
+
+    def _scan_column_height(self, column):
+        """
+            Computes the height of a column from the board, see
+            TetrisBase._scan_column_height
+        """
+        filled = self._bits & self._column_masks[column]
+
+        if not filled:
+            return 0
+
+        # The lowest set bit is the highest block of the column
+        top = ((filled & -filled).bit_length() - 1) // self._stride
+
+        return self._row_count - 1 - top
+
+    def _get_board_state(self):
+        """
+            Returns the board, see TetrisBase.snapshot
+
+            Neither the board nor its array are ever modified, they are
+            shared with the snapshot instead of being copied.
+
+            Returns
+            -------
+                tuple of int and 2D numpy array or None
+                    The board and its array if it was built
+        """
+        return self._bits, self._board_array
+
+    def _set_board_state(self, state, copy_board):
+        """
+            Sets the board from a state returned by _get_board_state
+
+            Parameters
+            ----------
+                state: tuple of int and 2D numpy array or None
+                    The board and its array
+                copy_board: bool
+                    Unused, the state is never modified
+        """
+        self._bits, self._board_array = state
+
+    def _create_copy(self):
+        """
+            Creates the instance used by get_copy
+
+            Returns
+            -------
+                TetrisBitboard
+                    A new game built with the same parameters
+        """
+        return TetrisBitboard(self._params)
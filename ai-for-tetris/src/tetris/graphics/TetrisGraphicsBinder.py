@@ -1,3 +1,7 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
 from src.tetris.base.Controls import Controls
 from src.tetris.graphics.TetrisGraphics import TetrisGraphics
 
@@ -5,9 +9,16 @@ class TetrisGraphicsBinder(TetrisGraphics):
     """
         Binds an external player (or set of command) to 
         the tetris graphics class
+
+        With a planner, the moves are computed one decision ahead on a worker
+        thread : while the moves of the current piece are displayed, the
+        moves of the next one are planned on a copy of the game where the
+        current moves are already played. The frames are then not blocked by
+        the player, unless it is slower than the display of a whole piece.
     """
 
-    def __init__(self, player, graphical_params, game_params):
+    def __init__(self, player, graphical_params, game_params,
+                 deadline_ms=None, planner=None):
         """
             Ctor
 
@@ -23,11 +34,32 @@ class TetrisGraphicsBinder(TetrisGraphics):
                 game_params: GameParameters
                     Parameters for the game. See class documentation for more
                     details
+                deadline_ms: float or None
+                    When given, the time given to the planner for each
+                    decision, passed as its deadline_ms keyword argument (see
+                    LookupAI.plan). The player is always called with the
+                    board only
+                planner: function or None
+                    When given, a function that takes a game as parameter
+                    and returns the actions to perform in this game, such as
+                    LookupAI.plan. It is used instead of the player and
+                    called on a worker thread with copies of the game. The
+                    worker stops when the game is over, see close
         """
         super().__init__(graphical_params, game_params)
         self._player = player
+        self._deadline_ms = deadline_ms
         self._mvt = []
 
+        self._planner = planner
+        self._executor = None
+        # Pending decision : the future of the planned moves and the game
+        # state they were planned for
+        self._plan = None
+
+        if self._planner is not None:
+            self._executor = ThreadPoolExecutor(max_workers=1)
+
     def on_update(self, events = ""):
         """
             Overrides on_update method, ignoring second parameter
@@ -39,12 +71,11 @@ class TetrisGraphicsBinder(TetrisGraphics):
                     with main class
         """
         if len(self._mvt) == 0:
-            mvts = self._player(self.get_current_game_state())
-
-            if type(mvts) is Controls:
-                self._mvt = [mvts]
+            if self._planner is None:
+                board = self.get_current_game_state()
+                self._mvt = self._decide(self._player, board, None)
             else:
-                self._mvt = mvts
+                self._mvt = self._consume_plan()
 
         if len(self._mvt) != 0:
             #print(self._mvt[0])
@@ -54,3 +85,108 @@ class TetrisGraphicsBinder(TetrisGraphics):
             mvt = Controls.NOTHING
 
         self.tick(mvt)
+
+        if self._is_over:
+            self.close()
+
+    def close(self):
+        """
+            Stops the planning worker, if any
+
+            The planning in progress, if any, is not waited for. Called
+            when the game is over, and to be called when the game is left
+            before.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+            self._plan = None
+
+    def _decide(self, function, argument, deadline_ms):
+        """
+            Calls the player or the planner
+
+            Parameters
+            ----------
+                function: function
+                    The player or the planner
+                argument: any
+                    The board or the game given to the function
+                deadline_ms: float or None
+                    When given, passed to the function as its deadline_ms
+                    keyword argument
+
+            Returns
+            -------
+                list of tetris.base.Controls.Controls
+                    The actions to perform
+        """
+        if deadline_ms is None:
+            mvts = function(argument)
+        else:
+            mvts = function(argument, deadline_ms=deadline_ms)
+
+        if type(mvts) is Controls:
+            return [mvts]
+        return list(mvts)
+
+    def _consume_plan(self):
+        """
+            Returns the planned actions and plans the next decision
+
+            The planned actions are only used if the game is in the state
+            they were planned for, otherwise they are computed right away.
+
+            Returns
+            -------
+                list of tetris.base.Controls.Controls
+                    The actions to perform
+        """
+        mvts = None
+
+        if self._plan is not None:
+            future, state = self._plan
+            self._plan = None
+
+            # Only waits when the planner is late
+            planned = future.result()
+            if np.array_equal(state, self.get_current_game_state()):
+                mvts = planned
+
+        if mvts is None:
+            mvts = self._decide(self._planner, self, self._deadline_ms)
+
+        self._start_planning(mvts)
+
+        return mvts
+
+    def _start_planning(self, mvts):
+        """
+            Plans the decision following the given actions on the worker
+
+            Once the worker is stopped (see close), the decisions are
+            computed when needed instead.
+
+            Parameters
+            ----------
+                mvts: list of tetris.base.Controls.Controls
+                    The actions about to be performed
+        """
+        if self._is_over or self._executor is None:
+            return
+
+        game = self.get_copy()
+
+        # Ticks as on_update does, one action per tick
+        for mvt in mvts if len(mvts) != 0 else [Controls.NOTHING]:
+            game.tick(mvt)
+
+        if game._is_over:
+            return
+
+        self._plan = (
+            self._executor.submit(
+                self._decide, self._planner, game, self._deadline_ms
+            ),
+            game.get_current_game_state()
+        )
@@ -0,0 +1,73 @@
+import random
+import unittest
+
+import numpy as np
+
+from src.AI.metrics import compute_board_features
+from src.AI.metrics import compute_features_after
+from src.AI.metrics import compute_landing_row
+from src.pieces import CLASSICAL_PIECES
+from src.tetris.base.GameParameters import GameParameters
+from src.tetris.base.TetrisBase import TetrisBase
+
+class TestFeaturesAfter(unittest.TestCase):
+    """
+        Compares the features computed without building the boards with the
+        drops played by the game, up to full boards
+    """
+
+    def test_drops_match_place(self):
+        ending = 0
+
+        for seed in range(20):
+            rng = random.Random(seed)
+            tetris = TetrisBase(
+                GameParameters(pieces=CLASSICAL_PIECES, seed=seed)
+            )
+
+            # Random drops stack the pieces until the game is over
+            while not tetris._is_over:
+                piece = tetris._current_piece
+                drops = tetris.enumerate_drops()
+                states, columns = zip(*drops)
+                heights, holes, row_fills = tetris.get_board_stats()
+                board = np.array(tetris._board[:-1, 1:-1])
+
+                features, lines, rows = compute_features_after(
+                    heights, holes, row_fills, piece, states, None, columns,
+                    board
+                )
+
+                for i, (state, column) in enumerate(drops):
+                    tetris.push()
+                    tetris.place(state, column)
+                    after = np.array(tetris._board[:-1, 1:-1])
+                    tetris.pop()
+
+                    # The game ends without placing the piece when it does
+                    # not fit (and after placing it when the next one does
+                    # not)
+                    blocked = np.array_equal(after, board)
+
+                    self.assertEqual(
+                        rows[i] < 0, blocked, (seed, state, column)
+                    )
+                    self.assertEqual(rows[i], compute_landing_row(
+                        heights, len(row_fills), piece, state, column
+                    ))
+
+                    if blocked:
+                        ending += 1
+                    elif lines[i] == 0:
+                        expected = compute_board_features(after)
+                        self.assertEqual(
+                            list(features[i, :7]), list(expected[:7])
+                        )
+
+                tetris.place(*rng.choice(drops))
+
+        # Full boards were reached
+        self.assertGreater(ending, 0)
+
+if __name__ == "__main__":
+    unittest.main()